@@ -6,6 +6,7 @@
 """
 from optparse import Values
 import json
+import sys
 import ruamel
 from ruamel import yaml
 
@@ -94,26 +95,37 @@ def H_list_writer_formats(opts):
 def H_relative(opts):
     "Validate URI's"
 
-    return validate_uris(opts, uriref.relativeURI)
+    return validate_uris(opts, uriref.is_relative, uriref.relativeURI)
 
 def H_absolute(opts):
     "Validate URI's"
 
-    return validate_uris(opts, uriref.absoluteURI)
+    return validate_uris(opts, uriref.is_absolute, uriref.absoluteURI)
 
 
-def validate_uris(opts, regex):
+def validate_uris(opts, validator, regex):
 
     outfile = get_output(opts.args)
     writer = writers[ opts.flags.output_format ]
     uris = opts.args.urirefs
     for uri in uris:
-        match = regex.match(uri)
-        if not match:
+        if guard_rejects(uri) or not validator(uri):
             if opts.flags.strict or opts.flags.quiet:
                 return 1
         elif not opts.flags.quiet:
-            writer( uri, match, outfile, opts )
+            # only match groups when there is output to write
+            writer( uri, regex.match(uri), outfile, opts )
+
+
+def guard_rejects(uri):
+    "Check `uri` with the input guard, if enabled. Print and return reason. "
+    guard = uriref.input_guard
+    if not guard:
+        return None
+    reason = guard.check(uri)
+    if reason:
+        print >>sys.stderr, "Rejected (%s): %r" % (reason, uri[:80])
+    return reason
 
 
 def H_parseuri(opts):
@@ -141,7 +153,10 @@ def H_parseuri(opts):
     writer = writers[ opts.flags.output_format ]
 
     for uri in uris:
-        match = uriref.match(uri)
+        if guard_rejects(uri):
+            status = 1
+            continue
+        match = uriref.match(uri, guard=False)
         writer( uri, match, outfile, opts )
 
     return status
@@ -251,8 +266,13 @@ if __name__ == '__main__':
       -O <format>, --output-format <format>
                     Override output format.
                     [default: plain].
+      --max-length <n>
+                    Reject references longer than this before matching
+                    [default: 8192].
+      --no-guard    Do not check length and characters before matching.
     """
-    import sys
     opts = get_opts(docstr, version=__version__)
+    if not opts.flags.no_guard:
+        uriref.input_guard = uriref.InputGuard(int(opts.flags.max_length))
     if not opts.cmds: opts.cmds = ['parseuri']
     sys.exit( main( opts.cmds[0], opts ) )
@@ -22,7 +22,7 @@ setup(
     ],
     long_description = """\
 URL and URN parser written in regular expressions.
-Based on RFC 2396 BNF terms. No revieto RFC 3986 planned but not started.
+Based on RFC 2396 BNF terms, with the RFC 3986 grammar as alternative.
 """,
     scripts = [
         'bin/uriref-cli.py',
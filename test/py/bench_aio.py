@@ -0,0 +1,83 @@
+"""
+Measure how responsive the event loop stays while parsing a burst of lines
+from an async source: inline with `uriref.parse_many` on the loop, and with
+`uriref.aio.parse_stream` in a thread and in a process pool.
+
+A heartbeat task sleeps 1 ms at a time and records how late it wakes up,
+which is how long the loop was blocked. Prints the lines per second, the
+maximum and mean heartbeat lag, and the mean and maximum time per batch
+spent on the loop reading lines as reported by parse_stream (`read_seconds`).
+These are wall times, on a busy machine they include preemption.
+"""
+import asyncio
+import concurrent.futures
+import sys
+import time
+
+import uriref
+from uriref import aio
+
+from res import fictional_urls, out_in_the_wild_urls, invalid_urls
+
+
+urls = [ url for url, expected in
+        fictional_urls + out_in_the_wild_urls + invalid_urls ]
+
+batch_size = 1024
+
+async def source(lines):
+    for i in range(lines):
+        if not i % batch_size:
+            await asyncio.sleep(0)
+        yield urls[i % len(urls)]
+
+async def heartbeat(lags):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - started - 0.001)
+
+async def parse_inline(lines, stats=None):
+    batch = []
+    async for line in source(lines):
+        batch.append(line)
+        if len(batch) == batch_size:
+            for result in uriref.parse_many(batch, errors='ignore'):
+                pass
+            batch = []
+    for result in uriref.parse_many(batch, errors='ignore'):
+        pass
+
+async def parse_executor(lines, executor=None, stats=None):
+    async for result in aio.parse_stream(source(lines), batch_size=batch_size,
+            executor=executor, stats=stats):
+        pass
+
+async def measure(func, *args):
+    lags, stats = [], []
+    beat = asyncio.ensure_future(heartbeat(lags))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await func(*args, stats=stats)
+    seconds = time.perf_counter() - started
+    beat.cancel()
+    return seconds, lags, stats
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with concurrent.futures.ProcessPoolExecutor(1) as pool:
+        tests = (
+            ('inline', parse_inline, ()),
+            ('thread', parse_executor, ()),
+            ('process', parse_executor, (pool,)),
+        )
+        print("Test name, Lines, Lines/s, Max lag (ms), Mean lag (ms), Read per batch mean/max (ms)")
+        for name, func, args in tests:
+            seconds, lags, stats = asyncio.run(measure(func, lines, *args))
+            read = [ batch['read_seconds'] * 1e3 for batch in stats ]
+            print("%s, %i, %.0f, %.2f, %.3f, %s" % (name, lines, lines / seconds,
+                max(lags or [seconds]) * 1e3,
+                sum(lags) / len(lags) * 1e3 if lags else seconds * 1e3,
+                "%.3f/%.3f" % (sum(read) / len(read), max(read))
+                if read else "-"))
@@ -0,0 +1,38 @@
+"""
+Compare per-call `uriref.match(url).groupdict()` against the batch generators
+`uriref.parse_many` (tuples and dicts) over the `fictional_urls` corpus.
+"""
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls
+
+
+urls = [ url for url, expected in fictional_urls ]
+
+def per_call(corpus):
+    for url in corpus:
+        uriref.match(url).groupdict()
+
+def batch_tuples(corpus):
+    for parts in uriref.parse_many(corpus):
+        pass
+
+def batch_dicts(corpus):
+    for parts in uriref.parse_many(corpus, as_dict=True):
+        pass
+
+def batch_host(corpus):
+    for host in uriref.parse_many(corpus, fields='host'):
+        pass
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    corpus = urls * cycles
+    print("Test name, URI-reference count, Time per URI (us)")
+    for func in (per_call, batch_tuples, batch_dicts, batch_host):
+        best = min(timeit.repeat(lambda: func(corpus), number=1, repeat=3))
+        print("%s, %s, %.3f" % (func.__name__, len(corpus), best / len(corpus) * 1e6))
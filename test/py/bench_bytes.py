@@ -0,0 +1,66 @@
+"""
+Time parsing the host of every line of a bytes log file: decoding lines to
+str first, matching the bytes lines with the bytes regexes, and matching
+memoryview slices of the memory mapped file.
+
+Prints the time per line and the log throughput.
+"""
+import mmap
+import os
+import sys
+import tempfile
+import timeit
+
+import uriref
+
+from res import fictional_urls, out_in_the_wild_urls
+
+
+urls = [ url for url, expected in fictional_urls + out_in_the_wild_urls ]
+
+def decoded(path):
+    with open(path, 'rb') as f:
+        lines = [ line.decode('latin-1').rstrip('\n') for line in f ]
+    for host in uriref.parse_many(lines, 'host', errors='ignore'):
+        pass
+
+def raw(path):
+    with open(path, 'rb') as f:
+        lines = [ line.rstrip(b'\n') for line in f ]
+    for host in uriref.parse_many(lines, 'host', errors='ignore'):
+        pass
+
+def mapped_lines(data):
+    view = memoryview(data)
+    start, end = 0, len(data)
+    while start < end:
+        stop = data.find(b'\n', start)
+        if stop < 0:
+            stop = end
+        yield view[start:stop]
+        start = stop + 1
+    view.release()
+
+def mapped(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for host in uriref.parse_many(mapped_lines(data), 'host', errors='ignore'):
+                pass
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for i in range(lines):
+                f.write(urls[i % len(urls)].encode('latin-1') + b"\n")
+        size = os.path.getsize(path)
+        print("Test name, Lines, Time per line (us), MB/s")
+        for name, func in (('decode to str', decoded), ('bytes lines', raw),
+                ('mmap memoryviews', mapped)):
+            best = min(timeit.repeat(lambda: func(path), number=1, repeat=3))
+            print("%s, %i, %.3f, %.1f" % (name, lines, best / lines * 1e6,
+                size / best / 1e6))
+    finally:
+        os.remove(path)
@@ -0,0 +1,43 @@
+"""
+Time `uriref.match` and `uriref.URIRef` with and without the parse cache on
+traffic that repeats a working set of references, and print cache stats.
+"""
+import random
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls
+
+
+def traffic(count, distinct):
+    "Generate `count` references drawn from `distinct` variations. "
+    rnd = random.Random(0)
+    urls = [ url for url, expected in fictional_urls if '?' not in url ]
+    working_set = [ "%s?id=%i" % (rnd.choice(urls), i) for i in range(distinct) ]
+    return [ working_set[int(rnd.paretovariate(0.2)) % distinct] for i in range(count) ]
+
+def run_match(corpus):
+    for url in corpus:
+        uriref.match(url)
+
+def run_uriref(corpus):
+    for url in corpus:
+        uriref.URIRef(url)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = traffic(count, count // 10)
+    print("Test name, Cache size, URI-reference count, Time per URI (us)")
+    for func in (run_match, run_uriref):
+        for maxsize in (None, 1000, count // 10):
+            if maxsize:
+                cache = uriref.enable_cache(maxsize)
+            best = min(timeit.repeat(lambda: func(corpus), number=1, repeat=3))
+            print("%s, %s, %i, %.3f" % (func.__name__, maxsize or 0, len(corpus),
+                best / len(corpus) * 1e6))
+            if maxsize:
+                print("# %r" % (cache.stats(),))
+                uriref.disable_cache()
@@ -0,0 +1,58 @@
+"""
+Compare memory (by tracemalloc) and time of parsing a list of references
+into a list of `match().groupdict()` results, and into offset columns with
+`uriref.parse_columns`, with NumPy (if installed) and with plain arrays.
+Also times `uriref.materialize` for the host column.
+"""
+import sys
+import timeit
+import tracemalloc
+
+import uriref
+
+from res import fictional_urls, out_in_the_wild_urls
+
+
+def corpus(count):
+    "Generate `count` distinct references, so strings are not shared. "
+    urls = [ url for url, expected in fictional_urls + out_in_the_wild_urls ]
+    return [ "%s%i" % (urls[i % len(urls)], i) for i in range(count) ]
+
+def groupdicts(urls):
+    return [ uriref.match(url).groupdict() for url in urls ]
+
+def columns(urls):
+    return uriref.parse_columns(urls, as_numpy=False)
+
+def numpy_columns(urls):
+    return uriref.parse_columns(urls, as_numpy=True)
+
+def measure(func, urls):
+    tracemalloc.start()
+    result = func(urls)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, result
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    urls = corpus(count)
+    tests = [ ('groupdicts', groupdicts), ('columns', columns) ]
+    try:
+        import numpy
+        tests.append(('numpy columns', numpy_columns))
+    except ImportError:
+        print("NumPy not installed, skipping numpy columns")
+    print("Test name, References, Bytes per reference, Peak bytes per reference, Parse (us), Materialize host (us)")
+    for name, func in tests:
+        size, peak, result = measure(func, urls)
+        best = min(timeit.repeat(lambda: func(urls), number=1, repeat=3))
+        if isinstance(result, list):
+            hosts = lambda: [ groups['host'] for groups in result ]
+        else:
+            hosts = lambda: uriref.materialize(urls, result, 'host')
+        host = min(timeit.repeat(hosts, number=1, repeat=3))
+        del result
+        print("%s, %i, %.1f, %.1f, %.3f, %.3f" % (name, count, size / float(count),
+            peak / float(count), best / count * 1e6, host / count * 1e6))
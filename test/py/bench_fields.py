@@ -0,0 +1,45 @@
+"""
+Compare host-only (and scheme plus host) extraction with the field-selective
+regexes of `uriref.compile_for` against a full `uriref.match`.
+"""
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls
+
+
+urls = [ url for url, expected in fictional_urls ]
+
+def full_match(corpus):
+    for url in corpus:
+        uriref.match(url).group('host')
+
+def selective(fields, validate):
+    regex_match = uriref.compile_for(fields, validate).match
+    def compiled_for(corpus):
+        for url in corpus:
+            regex_match(url).group(*fields)
+    return compiled_for
+
+def batch(fields, validate):
+    def parse_many(corpus):
+        for value in uriref.parse_many(corpus, fields=fields, validate=validate):
+            pass
+    return parse_many
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    corpus = urls * cycles
+    tests = [ ('match', 'host', True, full_match) ]
+    for fields in (('host',), ('scheme', 'host')):
+        for validate in (True, False):
+            tests.append(('compile_for', ' '.join(fields), validate, selective(fields, validate)))
+            tests.append(('parse_many', ' '.join(fields), validate, batch(fields, validate)))
+    print("Test name, Fields, Validate, URI-reference count, Time per URI (us)")
+    for name, fields, validate, func in tests:
+        best = min(timeit.repeat(lambda: func(corpus), number=1, repeat=3))
+        print("%s, %s, %s, %i, %.3f" % (name, fields, validate, len(corpus),
+            best / len(corpus) * 1e6))
@@ -0,0 +1,42 @@
+"""
+Compare the RFC 2396 and RFC 3986 grammars: the cost of merging and compiling
+`URI_reference` on first use, and the time per URI to match, validate and
+get the host with a field-selective regex.
+
+The corpus is the `fictional_urls` and `out_in_the_wild_urls` references,
+which are valid in both grammars.
+"""
+import sys
+import time
+import timeit
+
+import uriref
+
+from res import fictional_urls, out_in_the_wild_urls
+
+
+urls = [ url for url, expected in fictional_urls + out_in_the_wild_urls ]
+
+def run(func, cycles):
+    for x in range(0, cycles):
+        for url in urls:
+            func(url)
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    total = cycles * len(urls)
+    print("Grammar, Test name, Time (us)")
+    for grammar, prefix in sorted(uriref.grammars.items()):
+        start = time.perf_counter()
+        uriref.match(urls[0], grammar=grammar)
+        print("%s, first match, %.0f" % (grammar, (time.perf_counter() - start) * 1e6))
+        tests = (
+            ('match', lambda url: uriref.match(url, grammar=grammar)),
+            ('regex match', getattr(uriref, prefix+'URI_reference').match),
+            ('is_valid', lambda url: uriref.is_valid(url, grammar=grammar)),
+            ('host', uriref.compile_for('host', grammar=grammar).match),
+        )
+        for name, func in tests:
+            best = min(timeit.repeat(lambda: run(func, cycles), number=1, repeat=3))
+            print("%s, %s per URI, %.3f" % (grammar, name, best / total * 1e6))
@@ -0,0 +1,58 @@
+"""
+Time `uriref.match` with and without an `InputGuard` on input mixes with a
+growing share of garbage: oversized strings, markup and other text with
+characters outside `uric`, and near-misses that only fail at the end.
+
+Prints the mean time per input and the guard's rejection counts.
+"""
+import random
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls, out_in_the_wild_urls
+
+
+urls = [ url for url, expected in fictional_urls + out_in_the_wild_urls ]
+
+garbage = (
+    # oversized, mostly valid characters
+    lambda i: "http://example.org/" + "a/b;c" * 20000 + str(i),
+    # markup and prose
+    lambda i: '<a href="http://example.org/%i">link</a>' % i,
+    lambda i: "GET /index.html?id=%i HTTP/1.1\r\n" % i,
+    # binary junk
+    lambda i: bytes(range(i % 200, i % 200 + 56)).decode('latin-1'),
+    # valid up to the last character
+    lambda i: "http://example.org/path/to/%i/leaf.php?q=1{" % i,
+)
+
+def mix(count, share):
+    "Return `count` inputs of which `share` is garbage, shuffled. "
+    rand = random.Random(count)
+    junk = int(count * share)
+    inputs = [ garbage[i % len(garbage)](i) for i in range(junk) ]
+    inputs += [ urls[i % len(urls)] for i in range(count - junk) ]
+    rand.shuffle(inputs)
+    return inputs
+
+def run(inputs, guard):
+    for uri in inputs:
+        uriref.match(uri, guard=guard)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("Test name, Garbage share, Inputs, Time per input (us), Rejected (length/character)")
+    for share in (0.0, 0.1, 0.5, 0.9):
+        inputs = mix(count, share)
+        for name, guard in (('no guard', False), ('guard', uriref.InputGuard())):
+            best = min(timeit.repeat(lambda: run(inputs, guard), number=1, repeat=3))
+            rejected = "-"
+            if guard:
+                guard = uriref.InputGuard()
+                run(inputs, guard)
+                rejected = "%(length)i/%(character)i" % guard.rejections
+            print("%s, %.1f, %i, %.3f, %s" % (name, share, count,
+                best / count * 1e6, rejected))
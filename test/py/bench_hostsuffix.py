@@ -0,0 +1,85 @@
+"""
+Check URLs against a blocklist of host suffix rules: `str.endswith` over
+all rules on the `uriref.get_hostname` host (on a sample of the URLs only,
+as it scans every rule), a set lookup of each suffix of the host, and a
+`uriref.index.HostSuffixSet` per URL and with `filter`.
+
+Pass the number of rules (default 500000) and URLs (default 200000). Also
+prints the time to build the set and trie, the growth of the maximum
+resident set size while building, and the number of blocked URLs.
+"""
+import random
+import resource
+import sys
+import time
+
+import uriref
+from uriref.index import HostSuffixSet
+
+
+def generate(rules, urls, seed=1):
+    rnd = random.Random(seed)
+    tlds = ('com', 'net', 'org', 'co.uk', 'de', 'io')
+    blocked = [ "%s%d.%s" % (rnd.choice(('ads', 'track', 'spam')), i, rnd.choice(tlds))
+            for i in range(rules) ]
+    hosts = []
+    for i in range(urls):
+        if i % 4:
+            hosts.append("www.site%d.%s" % (rnd.randrange(rules), rnd.choice(tlds)))
+        else:
+            hosts.append("cdn.%s" % rnd.choice(blocked))
+    return blocked, [ "https://%s/path/%d?q=%d" % (host, i, i)
+            for i, host in enumerate(hosts) ]
+
+def endswith_scan(rules, urls):
+    blocked = 0
+    for url in urls:
+        host = uriref.get_hostname(url)
+        for rule in rules:
+            if host == rule or host.endswith('.' + rule):
+                blocked += 1
+                break
+    return blocked
+
+def suffix_set(rules, urls):
+    blocked = 0
+    for url in urls:
+        labels = uriref.get_hostname(url).split('.')
+        for i in range(len(labels)):
+            if '.'.join(labels[i:]) in rules:
+                blocked += 1
+                break
+    return blocked
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    rules = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    blocked, urls = generate(rules, count)
+    print("Test name, Rules, URLs, Time per URL (us), Blocked, Build (ms), MB")
+
+    rss, start = maxrss(), time.perf_counter()
+    rule_set = set(blocked)
+    print("build set, %d, , , , %.0f, %.0f" % (rules, (time.perf_counter() - start) * 1e3,
+        maxrss() - rss))
+    rss, start = maxrss(), time.perf_counter()
+    trie = HostSuffixSet(blocked)
+    print("build HostSuffixSet, %d, , , , %.0f, %.0f" % (rules,
+        (time.perf_counter() - start) * 1e3, maxrss() - rss))
+
+    sample = urls[:max(1, count // 2000)]
+    tests = (
+        ('get_hostname endswith scan', lambda: endswith_scan(blocked, sample), sample),
+        ('get_hostname suffix set', lambda: suffix_set(rule_set, urls), urls),
+        ('HostSuffixSet.contains', lambda: sum(map(trie.contains, urls)), urls),
+        ('HostSuffixSet.filter', lambda: len(list(trie.filter(urls))), urls),
+    )
+    for name, func, data in tests:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        print("%s, %d, %d, %.3f, %d, , " % (name, rules, len(data),
+            seconds / len(data) * 1e6, result))
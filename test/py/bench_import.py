@@ -0,0 +1,51 @@
+"""
+Track the startup cost of `import uriref`, as reported by `python -X importtime`,
+and the cost of the first `match` which merges and compiles the expressions.
+
+Run from the project root (the uriref package must be importable), make sure
+bytecode is compiled first (ie. `python -m compileall uriref`).
+"""
+import os
+import subprocess
+import sys
+
+
+first_match = """
+import time
+t = time.perf_counter()
+import uriref
+t1 = time.perf_counter()
+uriref.match('http://example.org/path')
+t2 = time.perf_counter()
+print("%i %i" % ((t1 - t) * 1e6, (t2 - t1) * 1e6))
+"""
+
+def importtime():
+    "Return self and cumulative microseconds for uriref from -X importtime. "
+    out = subprocess.run([ sys.executable, '-X', 'importtime', '-c', 'import uriref' ],
+            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    for line in out.splitlines():
+        fields = [ f.strip() for f in line.split(':', 1)[1].split('|') ]
+        if fields[2] == 'uriref':
+            return int(fields[0]), int(fields[1])
+
+def first_use():
+    out = subprocess.run([ sys.executable, '-c', first_match ],
+            stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    return tuple(map(int, out.split()))
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    os.environ.setdefault('PYTHONPATH', '.')
+    times = [ importtime() for x in range(runs) ]
+    uses = [ first_use() for x in range(runs) ]
+    print("Measure, Runs, Median (us)")
+    print("import self, %i, %i" % (runs, median([ t[0] for t in times ])))
+    print("import cumulative, %i, %i" % (runs, median([ t[1] for t in times ])))
+    print("import wallclock, %i, %i" % (runs, median([ u[0] for u in uses ])))
+    print("first match, %i, %i" % (runs, median([ u[1] for u in uses ])))
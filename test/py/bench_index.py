@@ -0,0 +1,82 @@
+"""
+Find all URLs under a prefix such as 'https://host/docs/' among many URLs:
+a linear scan of the list, bisect on a sorted list, and `URITrie.iter_prefix`.
+Also times building the sorted list and the trie, and the growth of the
+maximum resident set size while building the trie.
+
+Pass the number of URLs (default 1000000, use 10000000 for a full run). The
+string prefix of the scan and bisect also matches 'docsx', the trie only
+whole segments, the numbers of results are printed to compare.
+"""
+import bisect
+import random
+import resource
+import sys
+import time
+
+from uriref.index import URITrie
+
+
+def generate(count, seed=1):
+    rnd = random.Random(seed)
+    hosts = max(1, count // 200)
+    sections = ('docs', 'blog', 'news', 'shop', 'api')
+    for i in range(count):
+        host = "%s.example%d.org" % (rnd.choice(('www', 'docs', 'cdn')),
+                rnd.randrange(hosts))
+        path = "/".join([ rnd.choice(sections) ] + [ "p%d" % rnd.randrange(50)
+            for depth in range(rnd.randrange(4)) ])
+        yield "https://%s/%s/item-%d?id=%d" % (host, path, i, i)
+
+def scan(urls, prefix):
+    return [ url for url in urls if url.startswith(prefix) ]
+
+def sorted_prefix(urls, prefix):
+    found = []
+    for i in range(bisect.bisect_left(urls, prefix), len(urls)):
+        if not urls[i].startswith(prefix):
+            break
+        found.append(urls[i])
+    return found
+
+def trie_prefix(trie, prefix):
+    return [ url for url, value in trie.iter_prefix(prefix) ]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    urls = list(generate(count))
+    rnd = random.Random(2)
+    prefixes = [ url[:url.index('/', 8)] + "/docs/" for url in rnd.sample(urls, queries) ]
+
+    print("Test name, URLs, Time (ms), Results, MB")
+    ordered, seconds = timed(sorted, urls)
+    print("build sorted list, %d, %.0f, %d, " % (count, seconds * 1e3, len(ordered)))
+    rss = maxrss()
+    trie = URITrie()
+    def build():
+        for i, url in enumerate(urls):
+            trie.insert(url, i)
+    result, seconds = timed(build)
+    print("build trie, %d, %.0f, %d, %.0f" % (count, seconds * 1e3, len(trie),
+        maxrss() - rss))
+
+    for name, func, data in (('linear scan', scan, urls),
+            ('sorted bisect', sorted_prefix, ordered),
+            ('trie iter_prefix', trie_prefix, trie)):
+        total, results = 0.0, 0
+        for prefix in prefixes:
+            found, seconds = timed(func, data, prefix)
+            total += seconds
+            results += len(found)
+        print("%s per query, %d, %.3f, %d, " % (name, count, total / queries * 1e3,
+            results))
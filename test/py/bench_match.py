@@ -0,0 +1,30 @@
+"""
+Compare the single-pass `uriref.match` against the scheme-probe plus
+absoluteURI/relativeURI dispatch of `uriref.match_twopass`.
+
+Prints the mean time per URI for the `fictional_urls` corpus.
+"""
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls
+
+
+urls = [ url for url, expected in fictional_urls ]
+
+def run(func, cycles):
+    for x in range(0, cycles):
+        for url in urls:
+            func(url)
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    total = cycles * len(urls)
+    print("Test name, URI-reference count, Iterations, Time per URI (us)")
+    for name in ('match', 'match_twopass'):
+        func = getattr(uriref, name)
+        best = min(timeit.repeat(lambda: run(func, cycles), number=1, repeat=3))
+        print("%s, %s, %s, %.3f" % (name, len(urls), cycles, best / total * 1e6))
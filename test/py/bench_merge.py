@@ -0,0 +1,44 @@
+"""
+Time `uriref.merge_strings` against the former retry-until-resolved merge on
+synthetic grammars of growing size, and print the largest expanded terms of
+`grouped_partial_expressions` as reported by `uriref.merge_sizes`.
+"""
+import sys
+import timeit
+
+import uriref
+
+
+def merge_strings_retry(strings):
+    "The previous implementation: pop names and retry until formatted. "
+    results = {}
+    names = list(strings.keys())
+    while names:
+        name = names.pop(0)
+        try:
+            results[name] = (strings[name] % results)
+        except Exception as e:
+            names.append(name)
+    return results
+
+def grammar(terms):
+    "A chain of terms, each referencing the next and a leaf, root first. "
+    strings = { 'leaf': "[a-z]" }
+    for i in range(terms):
+        ref = "%%(t%i)s" % (i + 1) if i + 1 < terms else "x"
+        strings['t%i' % i] = "(%%(leaf)s %s)" % ref
+    return strings
+
+
+if __name__ == '__main__':
+    print("Test name, Terms, Time (ms)")
+    for terms in (10, 50, 100, 200):
+        strings = grammar(terms)
+        for func in (uriref.merge_strings, merge_strings_retry):
+            best = min(timeit.repeat(lambda: func(strings), number=1, repeat=3))
+            print("%s, %i, %.3f" % (func.__name__, terms, best * 1e3))
+    print()
+    print("Term, Partial size, Expanded size")
+    sizes = uriref.merge_sizes(uriref.grouped_partial_expressions)
+    for name, (size, expanded) in sorted(sizes.items(), key=lambda i: -i[1][1])[:10]:
+        print("%s, %i, %i" % (name, size, expanded))
@@ -0,0 +1,90 @@
+"""
+Deduplicate a crawl frontier by normal form: the number of unique references
+and throughput of `uriref.normalize_many`, with and without the memo cache,
+against normalizing with several passes over `urllib.parse.urlsplit` parts.
+
+The frontier draws references from a pool of spellings, four per canonical
+reference (case, default port, escapes and dot segments), with a heavy head
+like real link graphs. Pass the number of references (default 1000000, use
+10000000 for a full run) and the number of canonical references.
+"""
+import random
+import re
+import sys
+import time
+import urllib.parse
+
+import uriref
+
+
+def spellings(count):
+    pool = []
+    for i in range(count):
+        host = "www.example%d.org" % (i % (count // 8 + 1))
+        path = "/section%d/page%d.html" % (i % 97, i)
+        pool.extend((
+            "http://%s%s?id=%d" % (host, path, i),
+            "HTTP://%s:80%s?id=%d" % (host.upper(), path, i),
+            "http://%s/x/..%s?id=%d" % (host, path.replace('page', '%70age'), i),
+            "http://%s/./%s?id=%d" % (host, path[1:].replace('e', '%65'), i),
+        ))
+    return pool
+
+def frontier(pool, references, seed=1):
+    rnd = random.Random(seed)
+    size = len(pool)
+    for i in range(references):
+        yield pool[int(size ** rnd.random()) - 1]
+
+
+_escape = re.compile(r"%([0-9A-Fa-f]{2})")
+
+def _unescape(m):
+    c = chr(int(m.group(1), 16))
+    if c.isalnum() or c in '-._~':
+        return c
+    return m.group().upper()
+
+def multipass(uri):
+    parts = urllib.parse.urlsplit(uri)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if netloc.endswith(':%d' % uriref.default_ports.get(scheme, -1)):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = _escape.sub(_unescape, parts.path)
+    path = uriref.remove_dot_segments(path) or '/'
+    query = _escape.sub(_unescape, parts.query)
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+def dedupe_multipass(references):
+    return len(set(map(multipass, references)))
+
+def dedupe(references):
+    return len(set(uriref.normalize_many(references)))
+
+def generate_only(references):
+    for reference in references:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    references = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    canonical = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    pool = spellings(canonical)
+    print("Test name, References, Unique, Time (s), References/s")
+    tests = (
+        ('generate only', generate_only, None),
+        ('multipass urlsplit', dedupe_multipass, None),
+        ('normalize_many', dedupe, None),
+        ('normalize_many cached', dedupe, len(pool)),
+    )
+    for name, func, maxsize in tests:
+        if maxsize:
+            uriref.enable_normalize_cache(maxsize)
+        start = time.perf_counter()
+        unique = func(frontier(pool, references))
+        seconds = time.perf_counter() - start
+        uriref.disable_normalize_cache()
+        print("%s, %d, %d, %.2f, %.0f" % (name, references, unique, seconds,
+            references / seconds))
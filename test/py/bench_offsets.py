@@ -0,0 +1,71 @@
+"""
+Compare the transport of results from worker processes: `parse_file` with
+pickled groupdicts against `parse_file_offsets` with int32 offset records in
+shared memory, that the parent slices from a memory map of the file.
+
+Both read the host of every line in the parent. Prints the lines per second
+and the size of the results per line. Records hold all
+parts, the pickled groupdicts are smaller but have to be unpickled and
+allocated in the parent.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import timeit
+from multiprocessing import shared_memory
+
+from uriref import parallel
+
+from res import fictional_urls, out_in_the_wild_urls, invalid_urls
+
+
+urls = [ url for url, expected in
+        fictional_urls + out_in_the_wild_urls + invalid_urls ]
+
+chunk_bytes = 1<<20
+
+def run_pickled(path, workers):
+    for groups in parallel.parse_file(path, workers=workers, as_dict=True,
+            chunk_bytes=chunk_bytes):
+        if groups:
+            groups['host']
+
+def run_offsets(path, workers):
+    for chunk in parallel.parse_file_offsets(path, workers=workers,
+            chunk_bytes=chunk_bytes):
+        for i in range(len(chunk)):
+            chunk.view(i, 'host')
+
+def transfer_size(path):
+    "Return the result bytes per line for one chunk, pickled and as records. "
+    start, end = next(parallel.chunk_offsets(path, chunk_bytes))
+    results, stats = parallel.parse_chunk(path, start, end, as_dict=True)
+    name, count, stats = parallel.offset_chunk(path, start, end)
+    block = shared_memory.SharedMemory(name)
+    size = block.size
+    block.close()
+    block.unlink()
+    return len(pickle.dumps((results, stats))) / count, size / count
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    counts = [ int(a) for a in sys.argv[2:] ] or [ 1, 4, 16 ]
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for i in range(lines):
+                f.write(urls[i % len(urls)] + "\n")
+        sizes = transfer_size(path)
+        print("CPUs: %i" % os.cpu_count())
+        print("Test name, Workers, Lines, Lines/s, Result bytes per line")
+        for workers in counts:
+            for name, func, size in (('pickled groupdicts', run_pickled, sizes[0]),
+                    ('shared memory offsets', run_offsets, sizes[1])):
+                best = min(timeit.repeat(lambda: func(path, workers),
+                    number=1, repeat=3))
+                print("%s, %i, %i, %.0f, %.1f" % (name, workers, lines,
+                    lines / best, size))
+    finally:
+        os.remove(path)
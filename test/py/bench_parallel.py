@@ -0,0 +1,50 @@
+"""
+Time `uriref.parallel.parse_file` on a generated file of references with a
+growing number of worker processes, against parsing in this process.
+
+Prints the lines per second overall and the speedup over 0 workers (parsing
+in-process), and the mean parse throughput per worker process. Speedup is
+bound by the number of CPUs.
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from uriref import parallel
+
+from res import fictional_urls, out_in_the_wild_urls, invalid_urls
+
+
+urls = [ url for url, expected in
+        fictional_urls + out_in_the_wild_urls + invalid_urls ]
+
+def run(path, workers, stats):
+    for result in parallel.parse_file(path, workers=workers, stats=stats,
+            chunk_bytes=1<<20, fields=('scheme', 'host', 'abs_path')):
+        pass
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    counts = [ int(a) for a in sys.argv[2:] ] or [ 0, 1, 2, 4 ]
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for i in range(lines):
+                f.write(urls[i % len(urls)] + "\n")
+        print("CPUs: %i" % os.cpu_count())
+        print("Test name, Workers, Lines, Lines/s, Speedup, Lines/s per worker")
+        base = None
+        for workers in counts:
+            best = min(timeit.repeat(lambda: run(path, workers, {}),
+                number=1, repeat=3))
+            stats = {}
+            run(path, workers, stats)
+            per_worker = sum([ s['lines_per_second'] for s in stats.values() ]) \
+                    / len(stats)
+            base = base or best
+            print("parse_file, %i, %i, %.0f, %.2f, %.0f" % (workers, lines,
+                lines / best, base / best, per_worker))
+    finally:
+        os.remove(path)
@@ -0,0 +1,59 @@
+"""
+Compare URL pairs by domain: the `urlparse` heuristic that `onsamedomain`
+used before (the last two host labels), `uriref.onsamedomain` per pair, and
+`uriref.publicsuffix.same_site` for all pairs, with the test excerpt of the
+Public Suffix List.
+
+Pass the number of pairs (default 1000000), and optionally the path of a
+full copy of the list. Prints the time per pair, and the number of pairs
+that are on the same domain.
+"""
+import os
+import random
+import sys
+import time
+import urllib.parse
+
+import uriref
+from uriref import publicsuffix
+
+
+def onsamedomain_urlparse(url1, url2):
+    host1 = urllib.parse.urlparse(url1)[1].split('.')
+    host2 = urllib.parse.urlparse(url2)[1].split('.')
+    if host1 and host2 and host1.pop() != host2.pop():
+        return False
+    if host1 and host2:
+        return host1.pop() == host2.pop()
+    return False
+
+def generate(pairs, seed=1):
+    rnd = random.Random(seed)
+    domains = [ "site%d.%s" % (i, rnd.choice(('com', 'org', 'co.uk', 'kyoto.jp')))
+            for i in range(1000) ]
+    def url():
+        host = rnd.choice(('www.', 'cdn.', 'a.b.', '')) + rnd.choice(domains)
+        return "https://%s/page/%d" % (host, rnd.randrange(100))
+    pages = [ url() for i in range(10000) ]
+    for i in range(pairs):
+        page = pages[i % len(pages)]
+        yield page, pages[rnd.randrange(len(pages))] if i % 2 else url()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'public_suffix_list.dat')
+    pairs = list(generate(count))
+    publicsuffix.load(path)
+    tests = (
+        ('onsamedomain urlparse', lambda: [ onsamedomain_urlparse(*pair) for pair in pairs ]),
+        ('onsamedomain', lambda: [ uriref.onsamedomain(*pair) for pair in pairs ]),
+        ('same_site', lambda: list(publicsuffix.same_site(pairs))),
+    )
+    print("Test name, Pairs, Time per pair (us), Same domain")
+    for name, func in tests:
+        start = time.perf_counter()
+        same = sum(func())
+        seconds = time.perf_counter() - start
+        print("%s, %d, %.3f, %d" % (name, count, seconds / count * 1e6, same))
@@ -0,0 +1,51 @@
+"""
+Time the URI regexes on adversarial inputs of growing length: long runs
+that match a part of the grammar, followed by a character that makes the
+match fail. Time per character should stay flat as the length grows; before
+the expressions used possessive quantifiers some of these were quadratic.
+
+Prints the time for one match with `URI_reference`, `absoluteURI` and
+`relativeURI` each, and the time per input character.
+"""
+import sys
+import timeit
+
+import uriref
+
+
+inputs = (
+    # hostname labels and dashes
+    ('dashed label', lambda n: "http://" + "a-" * n + "!"),
+    ('host labels', lambda n: "http://" + "ab." * n + "1.{"),
+    ('trailing dash', lambda n: "http://" + "a" * n + ".-"),
+    ('IPv4 digits', lambda n: "http://" + "1." * n + "{"),
+    # authority
+    ('userinfo', lambda n: "http://" + "a:" * n + "@{"),
+    ('reg_name', lambda n: "http://u@" + "%?1" * n + "{"),
+    # paths
+    ('segments', lambda n: "http://a/" + "b/" * n + "{"),
+    ('params', lambda n: "/" + "a;" * n + "{"),
+    # opaque parts and queries
+    ('opaque query', lambda n: "a:" + "?a" * n + "{"),
+    ('relative opaque', lambda n: "%.?" * n + "#{"),
+    ('query', lambda n: "http://a/" + "?.a" * n + "{"),
+)
+
+regexes = ('URI_reference', 'absoluteURI', 'relativeURI')
+
+
+def run(string):
+    for name in regexes:
+        getattr(uriref, name).match(string)
+
+
+if __name__ == '__main__':
+    sizes = [ int(a) for a in sys.argv[1:] ] or [ 250, 1000, 4000, 16000 ]
+    run('')
+    print("Input, Repeats, Length, Time (ms), Time per char (ns)")
+    for name, generate in inputs:
+        for size in sizes:
+            string = generate(size)
+            best = min(timeit.repeat(lambda: run(string), number=1, repeat=3))
+            print("%s, %i, %i, %.3f, %.1f" % (name, size, len(string),
+                best * 1e3, best / len(string) * 1e9))
@@ -0,0 +1,88 @@
+"""
+Store the links of a link graph relative to their source page: the
+compression ratio of the references and the throughput of
+`uriref.make_relative`, which parses the base for every link, and of a
+`uriref.Resolver` per source page.
+
+Pass a link dump with a tab separated source and target URL per line, or
+the number of pages for a generated site with links to pages in the same,
+parent and sibling sections, to the section index, and to other hosts.
+"""
+import os
+import random
+import sys
+import time
+
+import uriref
+
+
+def generate(pages, links=20, seed=1):
+    rnd = random.Random(seed)
+    sections = [ "/%s/%s/" % (a, b) for a in ('news', 'docs', 'shop', 'blog')
+            for b in range(25) ]
+    def page():
+        return "https://www.example.org%spage-%d.html" % (rnd.choice(sections),
+                rnd.randrange(pages))
+    graph = []
+    for i in range(pages):
+        source = page()
+        section = source[:source.rfind('/') + 1]
+        targets = []
+        for j in range(links):
+            kind = rnd.random()
+            if kind < .4:
+                targets.append(section + "page-%d.html" % rnd.randrange(pages))
+            elif kind < .7:
+                targets.append(page())
+            elif kind < .8:
+                targets.append(section + "?sort=date#top")
+            elif kind < .9:
+                targets.append(page() + "#comments")
+            else:
+                targets.append("https://cdn%d.example.net/lib/%d.js" % (j % 3, j))
+        graph.append((source, targets))
+    return graph
+
+def read(path):
+    graph, last = [], None
+    with open(path) as f:
+        for line in f:
+            source, target = line.rstrip('\n').split('\t')
+            if source != last:
+                graph.append((source, []))
+                last = source
+            graph[-1][1].append(target)
+    return graph
+
+def per_link(graph):
+    for source, targets in graph:
+        for target in targets:
+            yield uriref.make_relative(source, target)
+
+def per_page(graph):
+    for source, targets in graph:
+        for ref in uriref.Resolver(source).make_relative_many(targets, errors='ignore'):
+            yield ref
+
+
+if __name__ == '__main__':
+    arg = sys.argv[1] if len(sys.argv) > 1 else '20000'
+    graph = read(arg) if os.path.exists(arg) else generate(int(arg))
+    links = sum([ len(targets) for source, targets in graph ])
+    size = sum([ len(target) for source, targets in graph for target in targets ])
+    print("Test name, Links, Time per link (us), Compression ratio, Round trip failures")
+    for name, func in (('make_relative', per_link), ('Resolver per page', per_page)):
+        start = time.perf_counter()
+        refs = list(func(graph))
+        seconds = time.perf_counter() - start
+        i, failures = 0, 0
+        for source, targets in graph:
+            resolver = uriref.Resolver(source)
+            for target in targets:
+                ref = refs[i]
+                if ref is not None and ref != target and resolver.resolve(ref) != target:
+                    failures += 1
+                i += 1
+        ratio = size / sum([ len(ref or '') for ref in refs ])
+        print("%s, %d, %.3f, %.2f, %d" % (name, links, seconds / links * 1e6, ratio,
+            failures))
@@ -0,0 +1,51 @@
+"""
+Resolve the links of a page against its base URL: `urllib.parse.urljoin`,
+`uriref.resolve` which parses the base for every reference, and a
+`uriref.Resolver` that parses the base once, per reference and in batch.
+
+The links are the references from the RFC 3986 examples (`resolve_urls`),
+and typical page links. Prints the time per reference, and the number of
+targets that differ from urljoin (which is not strict on some abnormal
+examples).
+"""
+import sys
+import timeit
+import urllib.parse
+
+import uriref
+
+from res import resolve_base, resolve_urls
+
+
+links = [ ref for ref, expected in resolve_urls ] + [
+    '/', '/index.html', 'about/', 'img/logo.png', '../css/site.css?v=3',
+    'https://cdn.example.net/lib.js', '//static.example.net/a.png',
+    '#top', '?page=2', 'news/2020/01/item.html#comments',
+]
+
+def per_reference(func, refs):
+    for ref in refs:
+        func(resolve_base, ref)
+
+def batch(refs):
+    for target in uriref.Resolver(resolve_base).resolve_many(refs):
+        pass
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    refs = links * cycles
+    resolver = uriref.Resolver(resolve_base)
+    tests = (
+        ('urljoin', lambda: per_reference(urllib.parse.urljoin, refs)),
+        ('uriref.resolve', lambda: per_reference(uriref.resolve, refs)),
+        ('Resolver.resolve', lambda: list(map(resolver.resolve, refs))),
+        ('Resolver.resolve_many', lambda: batch(refs)),
+    )
+    differ = sum([ urllib.parse.urljoin(resolve_base, ref) != resolver.resolve(ref)
+            for ref in links ])
+    print("Test name, References, Time per reference (us), Differ from urljoin")
+    for name, func in tests:
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        print("%s, %d, %.3f, %d" % (name, len(refs), best / len(refs) * 1e6,
+            differ if name != 'urljoin' else 0))
@@ -0,0 +1,48 @@
+"""
+Compare the 'scanner' and 'regex' engines of `uriref.match` with the stdlib
+`urllib.parse.urlsplit`, for single references and through `parse_many`.
+The LRU cache that Python 3.11+ wraps around urlsplit is bypassed.
+
+Prints the mean time per URI for the `fictional_urls` and
+`out_in_the_wild_urls` corpus.
+"""
+import sys
+import timeit
+import urllib.parse
+
+import uriref
+from uriref import scanner
+
+from res import fictional_urls, out_in_the_wild_urls
+
+
+urls = [ url for url, expected in fictional_urls + out_in_the_wild_urls ]
+
+def run(func, cycles):
+    for x in range(0, cycles):
+        for url in urls:
+            func(url)
+
+def run_many(engine, cycles):
+    for x in range(0, cycles):
+        for parsed in uriref.parse_many(urls, engine=engine):
+            pass
+
+urlsplit = getattr(urllib.parse.urlsplit, '__wrapped__', urllib.parse.urlsplit)
+
+tests = (
+    ('regex match', lambda cycles: run(uriref.engines['regex'], cycles)),
+    ('scanner split', lambda cycles: run(scanner.split, cycles)),
+    ('urlsplit', lambda cycles: run(urlsplit, cycles)),
+    ('regex parse_many', lambda cycles: run_many('regex', cycles)),
+    ('scanner parse_many', lambda cycles: run_many('scanner', cycles)),
+)
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    total = cycles * len(urls)
+    print("Test name, URI-reference count, Iterations, Time per URI (us)")
+    for name, test in tests:
+        best = min(timeit.repeat(lambda: test(cycles), number=1, repeat=3))
+        print("%s, %s, %s, %.3f" % (name, len(urls), cycles, best / total * 1e6))
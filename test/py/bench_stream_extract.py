@@ -0,0 +1,47 @@
+"""
+Compare `uriref.extract.StreamExtractor` fed with chunks of growing size to
+extracting from the whole text at once, on the generated text of
+`bench_extract`.
+
+Prints MB/s, the number of URIs found, and the most text carried over
+between chunks.
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from uriref import extract
+
+from bench_extract import generate
+
+
+def stream(data, size):
+    extractor = extract.StreamExtractor()
+    count = pending = 0
+    for i in range(0, len(data), size):
+        count += len(extractor.feed(data[i:i+size]))
+        pending = max(pending, extractor.pending)
+    return count + len(extractor.close()), pending
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 16 << 20
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        generate(path, size)
+        with open(path, 'rb') as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    print("Test name, Chunk size, MB/s, URIs, Max carried over")
+    count = sum([ 1 for found in extract.extract(data) ])
+    best = min(timeit.repeat(lambda: sum([ 1 for found in extract.extract(data) ]),
+        number=1, repeat=3))
+    print("whole text, %i, %.1f, %i, -" % (len(data), len(data) / best / 1e6, count))
+    for chunk in (64, 512, 4096, 65536, 1 << 20):
+        count, pending = stream(data, chunk)
+        best = min(timeit.repeat(lambda: stream(data, chunk), number=1, repeat=3))
+        print("stream, %i, %.1f, %i, %i" % (chunk, len(data) / best / 1e6,
+            count, pending))
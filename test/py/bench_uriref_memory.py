@@ -0,0 +1,54 @@
+"""
+Compare per-instance memory (by tracemalloc) and construction time of
+`uriref.URIRef`, which keeps part offsets in `__slots__`, with the former
+layout that kept the match object and its groupdict per instance.
+"""
+import sys
+import timeit
+import tracemalloc
+
+import uriref
+
+from res import fictional_urls
+
+
+class GroupdictURIRef(str):
+
+    "The previous URIRef layout: match object, groupdict and instance dict. "
+
+    def __new__(type, uri, *args, **kwds):
+        return str.__new__(type, uri)
+
+    def __init__(self, uri, opaque_targets=[]):
+        self.__match__ = uriref.match(uri)
+        self.__groups__ = self.__match__.groupdict()
+        self.opaque_targets = opaque_targets
+
+    def __getattr__(self, name):
+        return self.__groups__[name]
+
+
+def corpus(count):
+    "Generate `count` distinct references, so strings are not shared. "
+    urls = [ url for url, expected in fictional_urls ]
+    return [ "%s%i" % (urls[i % len(urls)], i) for i in range(count) ]
+
+def measure(cls, urls):
+    tracemalloc.start()
+    instances = [ cls(url) for url in urls ]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, instances
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    urls = corpus(count)
+    strings = sum([ sys.getsizeof(url) for url in urls ]) / float(count)
+    print("Layout, Instances, Bytes per instance, Bytes per instance (excl. str), Construct (us)")
+    for cls in (GroupdictURIRef, uriref.URIRef):
+        size, instances = measure(cls, urls)
+        del instances
+        best = min(timeit.repeat(lambda: [ cls(url) for url in urls ], number=1, repeat=3))
+        print("%s, %i, %.1f, %.1f, %.3f" % (cls.__name__, count, size / float(count),
+            size / float(count) - strings, best / count * 1e6))
@@ -0,0 +1,45 @@
+"""
+Compare validation with the non-capturing `uriref.is_valid`, `is_absolute` and
+`is_relative` against matching with the grouped regexes, on a mix of valid
+(`fictional_urls`) and invalid (`invalid_urls`) references.
+"""
+import sys
+import timeit
+
+import uriref
+
+from res import fictional_urls, invalid_urls
+
+
+def mixed_corpus():
+    valid = [ url for url, expected in fictional_urls ]
+    invalid = [ url for url, expected in invalid_urls ]
+    return valid + invalid
+
+def validate(func, corpus):
+    for url in corpus:
+        func(url)
+
+def matcher(regex):
+    def regex_match(url):
+        return regex.match(url) is not None
+    return regex_match
+
+
+if __name__ == '__main__':
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    corpus = mixed_corpus() * cycles
+    absolute = [ url for url in corpus if uriref.scheme.match(url) ]
+    relative = [ url for url in corpus if not uriref.scheme.match(url) ]
+    tests = [
+        ('is_valid', uriref.is_valid, corpus),
+        ('match', uriref.match, corpus),
+        ('is_absolute', uriref.is_absolute, absolute),
+        ('absoluteURI', matcher(uriref.absoluteURI), absolute),
+        ('is_relative', uriref.is_relative, relative),
+        ('relativeURI', matcher(uriref.relativeURI), relative),
+    ]
+    print("Test name, URI-reference count, Time per URI (us)")
+    for name, func, urls in tests:
+        best = min(timeit.repeat(lambda: validate(func, urls), number=1, repeat=3))
+        print("%s, %i, %.3f" % (name, len(urls), best / len(urls) * 1e6))
@@ -1,5 +1,13 @@
+import asyncio
+import contextlib
+import copy
+import os
+import pickle
+import random
 import re
+import subprocess
 import sys
+import tempfile
 import unittest
 import urlparse
 
@@ -17,7 +25,9 @@ def mkid(idstr):
 """
 Import testsets. Each uri is given with a dictionary of its parsed parts.
 """
-from res import fictional_urls, out_in_the_wild_urls, invalid_urls
+from res import fictional_urls, out_in_the_wild_urls, invalid_urls, \
+        rfc3986_urls, normalize_urls, resolve_base, resolve_urls, \
+        resolve_rootless_urls, public_suffix_hosts, onsamedomain_urls
 
 def verify_stdlib_compat(url, expected):
     """
@@ -50,6 +60,842 @@ def test_uriref_match(url, expected):
                 % (url, groups, expected)
     yield _test
 
+def test_uriref_match_twopass(url, expected):
+    """
+    The single-pass match should give the same parts as the scheme probe
+    plus absoluteURI/relativeURI dispatch.
+    """
+    def _test(*args):
+        groups = dict([ (k, v) for k, v in uriref.match(url).groupdict().items() if v ])
+        twopass = dict([ (k, v) for k, v in uriref.match_twopass(url).groupdict().items() if v ])
+        assert groups == twopass, \
+                "Testset[%s]: single-pass result:\n\t%s\n\nDiffers from two-pass result:\n\t%s\n" \
+                % (url, groups, twopass)
+    yield _test
+
+def test_uriref_parse_many(url, expected):
+    """
+    The batch generator should give the same parts as a single match.
+    """
+    def _test(*args):
+        groups = uriref.match(url).groupdict()
+        batch, = uriref.parse_many([ url ], as_dict=True)
+        assert groups == batch, \
+                "Testset[%s]: parse_many result:\n\t%s\n\nDiffers from match result:\n\t%s\n" \
+                % (url, batch, groups)
+        fields = tuple(groups)
+        batch, = uriref.parse_many([ url ], fields=fields)
+        assert batch == tuple([ groups[f] for f in fields ])
+    yield _test
+
+def test_uriref_match_cached(url, expected):
+    """
+    Matching through the parse cache should give the same parts, also on
+    repeated lookups.
+    """
+    def _test(*args):
+        groups = uriref.match(url).groupdict()
+        cache = uriref.enable_cache(4)
+        try:
+            for i in range(3):
+                cached = uriref.match(url).groupdict()
+                assert groups == cached, \
+                        "Testset[%s]: cached result:\n\t%s\n\nDiffers from match result:\n\t%s\n" \
+                        % (url, cached, groups)
+                cached['host'] = 'corrupted'
+            stats = cache.stats()
+            assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1), stats
+        finally:
+            uriref.disable_cache()
+    yield _test
+
+def groupdict_port(groups):
+    """
+    The URIRef port from match groups `groups`, as it was before the parts
+    were kept as offsets: the default for http(s) and file, or else the
+    group (the property raises AttributeError, which falls back to
+    `__getattr__`).
+    """
+    port = groups['port'] and int(groups['port'])
+    if not port:
+        if groups['scheme'] in ('http', 'https'):
+            return 80
+        elif groups['scheme'] in ('file',):
+            return 21
+        return groups['port']
+    return port
+
+def test_uriref_uriref(url, expected):
+    """
+    URIRef attributes should give the match groups, and path, port, query
+    and opaque_targets as before the parts were kept as offsets. The netpath
+    is None without net_path (it was '//NoneNone'). Pickled and copied
+    instances should keep the reference string and parts.
+    """
+    def _test(*args):
+        groups = uriref.match(url).groupdict()
+        ref = uriref.URIRef(url, opaque_targets=['target'])
+        for name in uriref.parts:
+            if name == 'port':
+                continue
+            assert getattr(ref, name) == groups[name], \
+                    "Testset[%s]: URIRef.%s is %r, match group %r" % (
+                    url, name, getattr(ref, name), groups[name])
+        assert ref.target == groups['opaque_part']
+        assert ref.hier_part is None
+        assert ref.query == groups['query']
+        assert ref.path == (groups['abs_path'] or groups['rel_path'] or
+                groups['net_path'] or None)
+        assert ref.port == groupdict_port(groups), (ref.port, groups['port'])
+        if groups['net_path'] is None:
+            assert ref.netpath is None
+        else:
+            assert ref.netpath == "//%s%s" % (groups['host'], groups['net_path'])
+        try:
+            ref.href
+            assert False, "Testset[%s]: URIRef.href exists" % url
+        except AttributeError:
+            pass
+        copies = [ pickle.loads(pickle.dumps(ref, protocol))
+                for protocol in range(pickle.HIGHEST_PROTOCOL + 1) ]
+        for copied in copies + [ copy.copy(ref), copy.deepcopy(ref) ]:
+            assert type(copied) is uriref.URIRef
+            assert str.__str__(copied) == url
+            assert copied.spans == ref.spans
+            assert copied.opaque_targets == ['target']
+            assert dict([ (name, copied.part(name)) for name in uriref.parts ]) == groups
+            assert copied.path == ref.path and copied.port == ref.port
+    yield _test
+
+merge_strings_cases = [
+    # strings, merged strings or the ValueError message
+    ( { 'a': "%(b)s-%(c)s", 'b': "%(c)s", 'c': "c" }, { 'a': "c-c", 'b': "c", 'c': "c" } ),
+    ( { 'a': "100%% %(b)s", 'b': "%%(a)s" }, { 'a': "100% %(a)s", 'b': "%(a)s" } ),
+    ( { 'a': "(%(b)s)", 'b': "b", 'c': "%(d)s" },
+        "Cannot resolve missing term(s): d (in c)" ),
+    ( { 'a': "%(x)s %(y)s" }, "Cannot resolve missing term(s): x, y (in a)" ),
+    ( { 'a': "%(x)s", 'b': "%(y)s" },
+        "Cannot resolve missing term(s): x (in a); y (in b)" ),
+    ( { 'a': "(%(a)s)?", 'b': "b" }, "Cannot resolve cyclic term(s): a -> a" ),
+    ( { 'a': "%(b)s", 'b': "%(c)s", 'c': "%(a)s", 'd': "%(a)s", 'e': "e" },
+        "Cannot resolve cyclic term(s): a -> b -> c -> a" ),
+]
+
+def test_uriref_merge(strings, expected):
+    """
+    Terms should be merged after the terms they reference, '%%' is not a
+    reference. Missing and cyclic references should raise ValueError naming
+    the terms.
+    """
+    def _test(*args):
+        for func in ( uriref.merge_order, uriref.merge_strings ):
+            try:
+                result = func(strings)
+            except ValueError as e:
+                assert str(e) == expected, \
+                        "Testset[%s]: %s raised %r, expected %r" % (
+                        strings, func.__name__, str(e), expected)
+                continue
+            assert not isinstance(expected, str), \
+                    "Testset[%s]: %s did not raise %r" % (strings, func.__name__, expected)
+            if func is uriref.merge_strings:
+                assert result == expected, result
+                continue
+            assert sorted(result) == sorted(strings), result
+            for name in result:
+                for ref in uriref.string_references(strings[name]):
+                    assert result.index(ref) < result.index(name), result
+    yield _test
+
+merge_size_terms = [ (name,) for name in sorted(uriref.partial_expressions) ]
+
+def test_uriref_merge_sizes(name):
+    """
+    merge_sizes should give the length of each partial expression before and
+    after merging.
+    """
+    def _test(*args):
+        partial = uriref.partial_expressions
+        sizes = uriref.merge_sizes(partial)
+        assert set(sizes) == set(partial)
+        merged = uriref.merge_strings(partial)[name]
+        assert sizes[name] == (len(partial[name]), len(merged)), sizes[name]
+        if not uriref.string_references(partial[name]):
+            assert merged == partial[name] % {}
+        else:
+            assert not uriref.string_references(merged), merged
+        assert uriref.merge_sizes(partial, uriref.merge_strings(partial)) == sizes
+    yield _test
+
+def test_uriref_is_valid(url, expected):
+    """
+    The validation-only expressions should accept the test URLs, and reject
+    the invalid ones (which have no expected result).
+    """
+    def _test(*args):
+        valid = expected is not None
+        assert uriref.is_valid(url) == valid, \
+                "Testset[%s]: is_valid should be %s" % (url, valid)
+        absolute = valid and bool(expected.get('scheme'))
+        assert uriref.is_absolute(url) == absolute, \
+                "Testset[%s]: is_absolute should be %s" % (url, absolute)
+    yield _test
+
+def test_uriref_compile_for(url, expected):
+    """
+    Field-selective regexes should give the same values for their fields as
+    a full match, with and without validating the remainder.
+    """
+    def _test(*args):
+        groups = uriref.match(url).groupdict()
+        for fields in ( ('host',), ('scheme', 'port'), ('net_path', 'query') ):
+            for validate in ( True, False ):
+                regex = uriref.compile_for(fields, validate)
+                values = regex.match(url).groupdict()
+                assert set(values) >= set(fields), (fields, values)
+                for field in fields:
+                    assert values[field] == groups[field], \
+                            "Testset[%s]: compile_for(%r, %s) %s is %r, not %r" \
+                            % (url, fields, validate, field, values[field], groups[field])
+    yield _test
+
+def test_uriref_parse_columns(url, expected):
+    """
+    The parts sliced with the offsets from parse_columns should be the same
+    as from parse_many, with and (if available) without NumPy.
+    """
+    def _test(*args):
+        batch, = uriref.parse_many([ url ], as_dict=True, errors='ignore')
+        for as_numpy in ( False, None ):
+            columns = uriref.parse_columns([ url ], as_numpy=as_numpy)
+            assert bool(columns['valid'][0]) == (batch is not None)
+            if batch is None:
+                continue
+            for name in uriref.parts:
+                value, = uriref.materialize([ url ], columns, name)
+                assert value == batch[name], \
+                        "Testset[%s]: parse_columns %s is %r, not %r" \
+                        % (url, name, value, batch[name])
+    yield _test
+
+def test_uriref_bytes(url, expected):
+    """
+    Bytes-like references should match without decoding, to the same parts
+    as the string, as bytes. URIRefView should slice the same parts.
+    """
+    def _test(*args):
+        m = uriref.match(url)
+        data = url.encode('ascii', 'replace')
+        for buffer in ( data, bytearray(data), memoryview(data) ):
+            bm = uriref.match(buffer)
+            assert (bm is None) == (m is None), \
+                    "Testset[%s]: bytes match differs for %s" % (url, type(buffer))
+            if m is None:
+                continue
+            for name in uriref.parts:
+                value = m.group(name)
+                if value is not None:
+                    value = value.encode('ascii')
+                assert bm.group(name) == value, \
+                        "Testset[%s]: bytes %s is %r, not %r" % (url, name,
+                                bm.group(name), value)
+                part = uriref.URIRefView(buffer).part(name)
+                assert (part is None and value is None) or bytes(part) == value
+        batch, = uriref.parse_many([ data ], fields=('host', 'query'), errors='ignore')
+        assert batch == (m and tuple([ m.group(name) and m.group(name).encode('ascii')
+            for name in ('host', 'query') ]))
+    yield _test
+
+def test_uriref_extract(url, expected):
+    """
+    Absolute URLs embedded in text, followed by punctuation, should be
+    extracted with the same parts as a match, from str and from bytes. After
+    a word with ':', the URL is found with a scheme allow-list, and without
+    if the URL has an authority.
+    """
+    def _test(*args):
+        from uriref import extract
+        if not expected or not expected.get('scheme') or \
+                url[-1] in extract.trailing + ')':
+            return
+        groups = uriref.match(url).groupdict()
+        text = "See %s, or (%s). Note: %s" % (url, url, url)
+        found = list(extract.extract(text))
+        assert [ (offset, uri) for offset, uri, g in found ] == [
+                (4, url), (len(url) + 10, url), (len(url) * 2 + 19, url) ], \
+                "Testset[%s]: extracted %r" % (url, found)
+        for offset, uri, g in found:
+            assert g == groups, \
+                    "Testset[%s]: extract result:\n\t%s\n\nDiffers from match result:\n\t%s\n" \
+                    % (url, g, groups)
+        data = text.encode('ascii')
+        found = list(extract.extract(data, schemes=[ groups['scheme'] ]))
+        assert [ uri for offset, uri, g in found ] == [ url.encode('ascii') ] * 3
+        for text in ( "Note:" + url, ("Note:" + url).encode('ascii') ):
+            found = list(extract.extract(text, schemes=[ groups['scheme'] ]))
+            assert [ offset for offset, uri, g in found ] == [ 5 ], \
+                    "Testset[%s]: extracted %r after 'Note:'" % (url, found)
+            if url.startswith(groups['scheme'] + '://'):
+                assert [ offset for offset, uri, g in extract.extract(text) ] == [ 5 ]
+    yield _test
+
+def test_uriref_stream_extract(url, expected):
+    """
+    Feeding text in chunks of any size to a StreamExtractor should give the
+    same URIs as extracting from the whole text, from str and from bytes.
+    """
+    def _test(*args):
+        from uriref import extract
+        text = "See %s, or (%s). Note: %s Note:%s" % (url, url, url, url)
+        for text in ( text, text.encode('ascii', 'replace') ):
+            whole = list(extract.extract(text))
+            for size in range(1, len(text) + 1):
+                # the longest run of URI characters is 'Note:%s'
+                stream = extract.StreamExtractor(max_tail=len(url) + 5)
+                found = []
+                for i in range(0, len(text), size):
+                    found.extend(stream.feed(text[i:i+size]))
+                    assert stream.pending <= stream.max_tail
+                found.extend(stream.close())
+                assert found == whole, \
+                        "Testset[%s]: stream extract with chunk size %i:\n\t%s\n\nDiffers from whole text:\n\t%s\n" \
+                        % (url, size, found, whole)
+    yield _test
+
+def test_uriref_scanner(url, expected):
+    """
+    The scanner engine should split valid references into the same parts as
+    the regex engine.
+    """
+    def _test(*args):
+        groups = uriref.match(url).groupdict()
+        scanned = uriref.match(url, engine='scanner').groupdict()
+        assert groups == scanned, \
+                "Testset[%s]: scanner result:\n\t%s\n\nDiffers from regex result:\n\t%s\n" \
+                % (url, scanned, groups)
+        batch, = uriref.parse_many([ url ], fields=('host', 'query'), engine='scanner')
+        assert batch == (groups['host'], groups['query'])
+        m = uriref.engines['regex'](url, 'rfc3986')
+        assert (m and m.groupdict()) == uriref.match(url, grammar='rfc3986').groupdict()
+        for func in ( uriref.match, lambda *args, **kwds: list(uriref.match_many(*args, **kwds)) ):
+            try:
+                func(url, engine='scanner', grammar='rfc3986')
+                assert False, "Testset[%s]: scanner accepted grammar rfc3986" % url
+            except ValueError:
+                pass
+    yield _test
+
+scanner_tokens = ( 'a', 'Z9', 'x-1', '0', '1.2.3.4', '-', '.', '_', '~', "'",
+        '%20', '%zz', ':', '/', '//', '?', '#', '@', '+', ';', '=', '$', ' ',
+        'http:', 'mailto:', '[', ']' )
+
+def generate_references(seed, count):
+    """
+    Return `count` references made of random `scanner_tokens`, mostly
+    delimiters, host-like labels and characters of the rare character
+    classes.
+    """
+    rnd = random.Random(seed)
+    return [ ''.join([ rnd.choice(scanner_tokens) for i in range(rnd.randrange(1, 10)) ])
+            for n in range(count) ]
+
+generated_references = [ (seed, 5000) for seed in range(1, 9) ]
+
+def test_uriref_scanner_generated(seed, count):
+    """
+    The scanner engine should split the generated references that the regex
+    engine accepts into the same parts.
+    """
+    def _test(*args):
+        for ref in generate_references(seed, count):
+            m = uriref.match(ref)
+            if m is None:
+                continue
+            scanned = uriref.match(ref, engine='scanner')
+            assert scanned and scanned.groupdict() == m.groupdict(), \
+                    "Generated[%r]: scanner result:\n\t%s\n\nDiffers from regex result:\n\t%s\n" \
+                    % (ref, scanned and scanned.groupdict(), m.groupdict())
+    yield _test
+
+def test_uriref_input_guard(url, expected):
+    """
+    The input guard should pass valid references, rejects too long ones, and
+    not change the match result for references it passes.
+    """
+    def _test(*args):
+        guard = uriref.InputGuard(max_length=len(url))
+        reason = guard.check(url)
+        if expected is not None:
+            assert reason is None, \
+                    "Testset[%s]: rejected by input guard (%s)" % (url, reason)
+        result = uriref.match(url, guard=guard)
+        assert (result is None) == (uriref.match(url) is None), \
+                "Testset[%s]: input guard changed match result" % url
+        if url:
+            guard = uriref.InputGuard(max_length=len(url) - 1)
+            assert guard.check(url) == guard.LENGTH
+            assert guard.rejections[guard.LENGTH] == 1
+    yield _test
+
+def test_uriref_rfc3986(url, expected):
+    """
+    Match with the RFC 3986 grammar, compare the non-empty groups with the
+    expected result. Validators and field-selective regexes should agree.
+    """
+    def _test(*args):
+        m = uriref.match(url, grammar='rfc3986')
+        assert m, "Testset[%s]: no RFC 3986 match" % url
+        groups = dict([ (k, v) for k, v in m.groupdict().items() if v ])
+        assert groups == expected, \
+                "Testset[%s]: RFC 3986 match failure:\n\t%s\n\nShould match result:\n\t%s\n" \
+                % (url, groups, expected)
+        assert uriref.is_valid(url, grammar='rfc3986')
+        assert uriref.is_absolute(url, grammar='rfc3986') == ('scheme' in expected)
+        assert uriref.InputGuard(grammar='rfc3986').check(url) is None
+        host = uriref.compile_for('host', grammar='rfc3986').match(url).group('host')
+        assert host == m.group('host')
+    yield _test
+
+greedy_regexes = {}
+
+def greedy_regex(grammar):
+    """
+    Compile the 'URI_reference' template of `grammar` as on Python before
+    3.11, with `uriref.possessive` forced off.
+    """
+    if grammar not in greedy_regexes:
+        prefix = uriref.grammars[grammar]
+        pattern = getattr(uriref, prefix+'regex_templates')['URI_reference']
+        possessive, uriref.possessive = uriref.possessive, False
+        try:
+            greedy = pattern % uriref._template_expressions(prefix)
+        finally:
+            uriref.possessive = possessive
+        assert greedy == uriref.greedy(pattern %
+                getattr(uriref, prefix+'grouped_expressions_possessive'))
+        greedy_regexes[grammar] = re.compile(greedy, re.VERBOSE)
+    return greedy_regexes[grammar]
+
+def test_uriref_greedy(url, expected):
+    """
+    The regexes without possessive quantifiers should match the same groups,
+    for both grammars. Regexes composed from the public expressions should
+    backtrack, ie. a reg_name followed by a port.
+    """
+    def _test(*args):
+        for grammar in ('rfc2396', 'rfc3986'):
+            m = uriref.match(url, grammar=grammar)
+            g = greedy_regex(grammar).match(url)
+            assert (m and m.groupdict()) == (g and g.groupdict()), \
+                    "Testset[%s]: %s greedy match differs:\n\t%s\n\nFrom:\n\t%s\n" \
+                    % (url, grammar, g and g.groupdict(), m and m.groupdict())
+            if m and m.group('port') and not m.group('userinfo') \
+                    and m.group('host')[:1] != '[':
+                expressions = getattr(uriref, uriref.grammars[grammar]+'expressions')
+                composed = re.match(r"^[^:]+ :// (?P<name> %(reg_name)s) : (?P<p> [0-9]+)"
+                        % expressions, url, re.VERBOSE)
+                assert composed and composed.group('name', 'p') == m.group('host', 'port'), \
+                        "Testset[%s]: %s composed regex did not backtrack" % (url, grammar)
+    yield _test
+
+def test_uriref_normalize(url, expected):
+    """
+    Normalize, also from a URIRef, with the memo cache and in batch. The
+    normal form should not change when normalized again.
+    """
+    def _test(*args):
+        result = uriref.normalize(url)
+        assert result == expected, \
+                "Testset[%s]: normalized to %r, expected %r" % (url, result, expected)
+        assert uriref.normalize(result) == result
+        assert uriref.URIRef(url, grammar='rfc3986').normalized() == expected
+        assert list(uriref.normalize_many([url, '%', url], errors='ignore')) == \
+                [expected, None, expected]
+        cache = uriref.enable_normalize_cache(2)
+        try:
+            assert uriref.normalize(url) == uriref.normalize(url) == expected
+            assert cache.cache_info().hits == 1
+            assert list(uriref.normalize_many([url, '%', url], errors='skip')) == \
+                    [expected, expected]
+        finally:
+            uriref.disable_normalize_cache()
+    yield _test
+
+def test_uriref_resolve(url, expected, base=resolve_base):
+    """
+    Resolve against the RFC 3986 example base (or `base`), with `resolve`, a
+    Resolver and in batch. Single and batch resolution should both apply
+    the input guard.
+    """
+    def _test(*args):
+        result = uriref.resolve(base, url)
+        assert result == expected, \
+                "Testset[%s]: resolved to %r, expected %r" % (url, result, expected)
+        resolver = uriref.Resolver(base)
+        assert resolver.resolve(url) == expected
+        assert list(resolver.resolve_many([url, '%', url], errors='ignore')) == \
+                [expected, None, expected]
+        assert uriref.resolve(expected, '') == expected.split('#')[0]
+        uriref.input_guard = uriref.InputGuard(max_length=len(url) - 1)
+        try:
+            try:
+                resolver.resolve(url)
+                assert False, "Testset[%s]: guard did not apply to resolve" % url
+            except uriref.MalformedURLExpection:
+                pass
+            assert list(resolver.resolve_many([url], errors='ignore')) == [None]
+        finally:
+            uriref.input_guard = None
+    yield _test
+
+def test_uriref_make_relative(url, expected):
+    """
+    The reference made relative to a base should resolve back to the target,
+    for the RFC 3986 examples no longer than the example reference.
+    """
+    def _test(*args):
+        target = expected if isinstance(expected, str) else url
+        m = uriref.match(target, grammar='rfc3986')
+        if not m or not m.group('scheme'):
+            return
+        for base in (resolve_base, 'http://a/', 'http://example.org/a/b', 'urn:x:y'):
+            resolver = uriref.Resolver(base)
+            ref = resolver.make_relative(target)
+            if resolver.resolve(target) == target:
+                assert resolver.resolve(ref) == target, \
+                        "Testset[%s]: %r relative to %s does not resolve" % (target, ref, base)
+            else:
+                assert ref == target
+            assert list(resolver.make_relative_many([target, '%', 'a/b'],
+                    errors='ignore')) == [ref, None, None]
+        if isinstance(expected, str):
+            assert len(uriref.make_relative(resolve_base, target)) <= len(url)
+    yield _test
+
+_test_tries = []
+
+def test_trie():
+    """
+    Return a URITrie with the absolute RFC 3986 references of all test sets,
+    with their index as value.
+    """
+    if not _test_tries:
+        from uriref.index import URITrie
+        trie = URITrie()
+        for i, (url, expected) in enumerate(fictional_urls + out_in_the_wild_urls
+                + rfc3986_urls):
+            if uriref.is_absolute(url, grammar='rfc3986'):
+                trie.insert(url, i)
+        _test_tries.append(trie)
+    return _test_tries[0]
+
+def test_uriref_index(url, expected):
+    """
+    Every absolute reference should be found in the trie, and under its own
+    prefix and host. Counts per node should agree with the iterated URIs.
+    """
+    def _test(*args):
+        trie = test_trie()
+        if not uriref.is_absolute(url, grammar='rfc3986'):
+            assert url not in trie
+            return
+        assert url in trie
+        value = trie.lookup(url)
+        assert trie.lookup(url + '-', 'missing') == 'missing'
+        for subdomains in (False, True):
+            found = dict(trie.iter_prefix(url, subdomains))
+            assert found.get(url) == value, \
+                    "Testset[%s]: not under its prefix, %r" % (url, found)
+            assert trie.count(url, subdomains) == len(found)
+        children = trie.iter_children(url, True)
+        assert sum([ count for key, count in children ]) <= trie.count(url, True)
+        trie.remove(url)
+        assert url not in trie and url not in list(trie)
+        trie.insert(url, value)
+        assert len(trie) == len(list(trie))
+    yield _test
+
+public_suffix_list = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'public_suffix_list.dat')
+
+@contextlib.contextmanager
+def default_public_suffixes(path):
+    """
+    Unset the default list and set its path in the environment, to be loaded
+    on first use. The previous list and environment are restored after.
+    """
+    from uriref import publicsuffix
+    previous = publicsuffix.public_suffixes, os.environ.get(publicsuffix.environ_key)
+    os.environ[publicsuffix.environ_key] = path
+    publicsuffix.public_suffixes = None
+    try:
+        yield
+    finally:
+        publicsuffix.public_suffixes = previous[0]
+        if previous[1] is None:
+            del os.environ[publicsuffix.environ_key]
+        else:
+            os.environ[publicsuffix.environ_key] = previous[1]
+
+def test_uriref_public_suffix(host, registered, icann_registered):
+    """
+    Registered domains with the test excerpt of the Public Suffix List, with
+    and without its private domains. URLs on a host are on the same site as
+    URLs on subdomains of its registered domain.
+    """
+    def _test(*args):
+        from uriref import publicsuffix
+        suffixes = publicsuffix.PublicSuffixList(
+                publicsuffix.read_rules(public_suffix_list))
+        icann = publicsuffix.PublicSuffixList(
+                publicsuffix.read_rules(public_suffix_list, private=False))
+        result = suffixes.registered_domain(host)
+        assert result == registered, \
+                "Testset[%s]: registered domain %r, expected %r" % (host, result, registered)
+        assert icann.registered_domain(host) == icann_registered
+        url = "http://%s/path" % host
+        assert publicsuffix.registered_domain(url, suffixes) == registered
+        with default_public_suffixes(''):
+            assert publicsuffix.registered_domain(url) == \
+                    publicsuffix.PublicSuffixList().registered_domain(host)
+        with default_public_suffixes(public_suffix_list):
+            assert publicsuffix.registered_domain(url) == registered
+        pairs = [ (url, "https://%s" % host), (url, "http://sub.%s" % host),
+                (url, "http://sub.%s" % (registered or 'other.example')), (url, "/path") ]
+        assert list(publicsuffix.same_site(pairs, suffixes)) == \
+                [True, registered is not None, registered is not None, False]
+    yield _test
+
+def test_uriref_onsamedomain(url1, url2, same, same_default):
+    """
+    onsamedomain should use the list file from the environment, and compare
+    the last two labels of the hosts without a list.
+    """
+    def _test(*args):
+        from uriref import publicsuffix
+        with default_public_suffixes(public_suffix_list):
+            result = uriref.onsamedomain(url1, url2)
+            assert result == same, \
+                    "Testset[%s]: onsamedomain(%r) is %r, expected %r" % (
+                    url1, url2, result, same)
+            assert publicsuffix.public_suffixes.rules > 1
+        with default_public_suffixes(''):
+            assert uriref.onsamedomain(url1, url2) == same_default
+            assert publicsuffix.public_suffixes.rules == 0
+    yield _test
+
+def test_uriref_host_suffix(url, expected):
+    """
+    A HostSuffixSet should match the host of a URL, URIRef or host string
+    (also with a port) like a scan of the rules with `str.endswith` on label
+    boundaries.
+    """
+    def _test(*args):
+        from uriref.index import HostSuffixSet
+        m = uriref.compile_for('host', grammar='rfc3986').match(url)
+        host = m and m.group('host')
+        rules = [ 'example.org', 'ORG', 'www.example.net', '*.co.uk', 'org.uk',
+                'localhost', 'sub.a.b.c.example.com' ]
+        suffixes = HostSuffixSet(rules)
+        expect = bool(host) and any([ host.lower() == rule or
+                host.lower().endswith('.' + rule)
+                for rule in [ r.lower().lstrip('*.') for r in rules ] ])
+        assert suffixes.contains(url) == expect, \
+                "Testset[%s]: host %r, expected %s" % (url, host, expect)
+        assert (url in suffixes) == expect
+        assert list(suffixes.filter([url], exclude=True)) == ([] if expect else [url])
+        if host and not host.startswith('['):
+            assert suffixes.contains(host) == expect
+            for item in ( host + ':8080', host + ':' ):
+                assert suffixes.host(item) == host
+                assert suffixes.contains(item) == expect, \
+                        "Testset[%s]: host and port %r, expected %s" % (url, item, expect)
+                assert list(suffixes.filter([item], exclude=True)) == ([] if expect else [item])
+            assert HostSuffixSet([host]).find('a.' + host) == host.lower()
+            assert not HostSuffixSet(['a' + host]).contains(url)
+        if expected and uriref.is_valid(url) and uriref.match(url).group('host') == host:
+            assert suffixes.contains(uriref.URIRef(url)) == expect
+    yield _test
+
+_parallel_results = {}
+
+def parse_test_file(ordered):
+    """
+    Parse a file with all test URLs in two worker processes, once per order.
+    Returns the references with their results. In order, the parts sliced
+    with the offsets from parse_file_offsets should be the same.
+    """
+    if ordered not in _parallel_results:
+        urls = [ url for url, expected in
+                fictional_urls + out_in_the_wild_urls + invalid_urls ]
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write("\n".join(urls) + "\n")
+            from uriref import parallel
+            stats = {}
+            results = list(parallel.parse_file(path, workers=2, chunk_bytes=256,
+                ordered=ordered, as_dict=True, stats=stats))
+            if ordered:
+                offsets = []
+                for chunk in parallel.parse_file_offsets(path, workers=2,
+                        chunk_bytes=256):
+                    for i in range(len(chunk)):
+                        offsets.append(chunk.valid(i) and dict([ (name,
+                            chunk.group(i, name)) for name in chunk.fields ]) or None)
+                assert offsets == results, "parse_file_offsets differs from parse_file"
+        finally:
+            os.remove(path)
+        assert sum([ s['lines'] for s in stats.values() ]) == len(urls), stats
+        if ordered:
+            results = list(zip(urls, results))
+        _parallel_results[ordered] = results
+    return _parallel_results[ordered]
+
+_parallel_stderr = []
+
+def parallel_stderr():
+    """
+    Read offsets of a file with all test URLs in a new interpreter, with
+    warnings as errors, returns its stderr. The shared memory blocks of the
+    workers should not be reported as leaked or unlinked twice.
+    """
+    if not _parallel_stderr:
+        urls = [ url for url, expected in
+                fictional_urls + out_in_the_wild_urls + invalid_urls ]
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write("\n".join(urls) + "\n")
+            script = "import sys; from uriref import parallel\n" \
+                "for chunk in parallel.parse_file_offsets(sys.argv[1], workers=2, chunk_bytes=256): pass"
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+                [ os.path.dirname(os.path.dirname(os.path.abspath(uriref.__file__))) ] +
+                os.environ.get('PYTHONPATH', '').split(os.pathsep)))
+            _parallel_stderr.append(subprocess.run([ sys.executable, '-W', 'error',
+                '-c', script, path ], stderr=subprocess.PIPE, universal_newlines=True,
+                env=env).stderr)
+        finally:
+            os.remove(path)
+    return _parallel_stderr[0]
+
+def test_uriref_parallel(url, expected):
+    """
+    Parsing a file in worker processes should give the same parts as
+    parse_many, in input order or in any order, also from shared memory
+    offsets. Shared memory should be cleaned up without warnings.
+    """
+    def _test(*args):
+        stderr = parallel_stderr()
+        assert not stderr, "parse_file_offsets wrote to stderr:\n%s" % stderr
+        batch, = uriref.parse_many([ url ], as_dict=True, errors='ignore')
+        results = parse_test_file(True)
+        assert (url, batch) in results, \
+                "Testset[%s]: parse_file result differs from parse_many:\n\t%s\n" \
+                % (url, batch)
+        values = [ result for u, result in results ]
+        assert values.count(batch) == parse_test_file(False).count(batch), \
+                "Testset[%s]: unordered parse_file result differs" % url
+    yield _test
+
+_aio_results = []
+
+class AsyncLines:
+    "Async iterable over `lines`, as a StreamReader yields them. "
+    def __init__(self, lines):
+        self.lines = iter(lines)
+    def __aiter__(self):
+        return self
+    def __anext__(self):
+        for line in self.lines:
+            return asyncio.sleep(0, line)
+        raise StopAsyncIteration
+
+def parse_test_stream():
+    """
+    Parse all test URLs from an async source in small batches, returns the
+    references with their results.
+    """
+    if not _aio_results:
+        from uriref import aio
+        urls = [ url for url, expected in
+                fictional_urls + out_in_the_wild_urls + invalid_urls ]
+        lines = AsyncLines([ url.encode('latin-1') + b"\r\n" for url in urls ])
+        stats = []
+        results = aio.parse_stream(lines, batch_size=4, max_pending=2,
+                stats=stats, as_dict=True)
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    _aio_results.append(loop.run_until_complete(results.__anext__()))
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.close()
+        assert sum([ batch['lines'] for batch in stats ]) == len(urls), stats
+        assert set(stats[0]) == set(('lines', 'parse_seconds', 'read_seconds',
+            'latency')), stats
+        _aio_results[:] = zip(urls, _aio_results)
+    return _aio_results
+
+def test_uriref_aio(url, expected):
+    """
+    Parsing lines from an async source should give the same parts as
+    parse_many, in input order.
+    """
+    def _test(*args):
+        batch, = uriref.parse_many([ url ], as_dict=True, errors='ignore')
+        assert (url, batch) in parse_test_stream(), \
+                "Testset[%s]: parse_stream result differs from parse_many:\n\t%s\n" \
+                % (url, batch)
+    yield _test
+
+aio_slow_urls = fictional_urls[:5]
+_aio_slow_results = []
+
+def parse_slow_stream():
+    """
+    Parse the test URLs from a source that waits between lines, and does not
+    end until all results are in. Returns the references with their results.
+    """
+    if not _aio_slow_results:
+        from uriref import aio
+        urls = [ url for url, expected in aio_slow_urls ]
+        async def run():
+            received = asyncio.Event()
+            async def lines():
+                for url in urls:
+                    await asyncio.sleep(0.01)
+                    yield url
+                await received.wait()
+            results = []
+            async for result in aio.parse_stream(lines(), batch_size=1024,
+                    max_pending=2, flush_seconds=0.02, as_dict=True):
+                results.append(result)
+                if len(results) == len(urls):
+                    received.set()
+            return results
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(asyncio.wait_for(run(), 10))
+        finally:
+            loop.close()
+        _aio_slow_results[:] = zip(urls, results)
+    return _aio_slow_results
+
+def test_uriref_aio_slow(url, expected):
+    """
+    Lines from a slow source should be parsed in partial batches after
+    `flush_seconds`, and their results yielded before the source ends.
+    """
+    def _test(*args):
+        batch, = uriref.parse_many([ url ], as_dict=True, errors='ignore')
+        assert (url, batch) in parse_slow_stream(), \
+                "Testset[%s]: parse_stream result from a slow source differs:\n\t%s\n" \
+                % (url, batch)
+    yield _test
+
 #@profile
 def test_uriref_urlparse(url, expected):
     """
@@ -99,6 +945,33 @@ def test_stdlib_compare(url, expected):
 testcases = [
         ('verify_stdlib_compat', "fictional_urls out_in_the_wild_urls".split()),
         ('test_uriref_match', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_match_twopass', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_parse_many', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_match_cached', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_compile_for', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_parse_columns', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_bytes', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_extract', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_stream_extract', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_scanner', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_scanner_generated', ["generated_references"]),
+        ('test_uriref_uriref', "fictional_urls out_in_the_wild_urls".split()),
+        ('test_uriref_merge', ["merge_strings_cases"]),
+        ('test_uriref_merge_sizes', ["merge_size_terms"]),
+        ('test_uriref_is_valid', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_input_guard', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_rfc3986', ["rfc3986_urls"]),
+        ('test_uriref_greedy', "fictional_urls out_in_the_wild_urls invalid_urls rfc3986_urls".split()),
+        ('test_uriref_normalize', ["normalize_urls"]),
+        ('test_uriref_resolve', "resolve_urls resolve_rootless_urls".split()),
+        ('test_uriref_index', "fictional_urls out_in_the_wild_urls rfc3986_urls".split()),
+        ('test_uriref_host_suffix', "fictional_urls out_in_the_wild_urls rfc3986_urls invalid_urls".split()),
+        ('test_uriref_public_suffix', ["public_suffix_hosts"]),
+        ('test_uriref_onsamedomain', ["onsamedomain_urls"]),
+        ('test_uriref_make_relative', "fictional_urls out_in_the_wild_urls resolve_urls".split()),
+        ('test_uriref_parallel', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_aio', "fictional_urls out_in_the_wild_urls invalid_urls".split()),
+        ('test_uriref_aio_slow', ["aio_slow_urls"]),
         ('test_uriref_urlparse', "fictional_urls out_in_the_wild_urls".split()),
         ('test_stdlib_compare', "fictional_urls out_in_the_wild_urls".split()),
 ]
@@ -125,5 +125,209 @@ out_in_the_wild_urls = [
             'port': None, 'rel_path': None })
 ]
 
-invalid_urls = []
+invalid_urls = [
+    ( '<http://example.org/>', None ),
+    ( 'http://example.org/"quoted"', None ),
+    ( 'http://example.org/a\\b', None ),
+    ( 'http://example.org/{id}', None ),
+    ( 'http://example.org/^caret', None ),
+    ( 'http://example.org/`tick`', None ),
+    ( 'http://exa|mple.org/', None ),
+    ( 'mailto:<mailbox@example.org>', None ),
+    ( 'a#b#c', None ),
+    ( '', None ),
+]
+
+
+rfc3986_urls = [
+    ( 'ftp://ftp.is.co.za/rfc/rfc1808.txt',
+    {'scheme': 'ftp', 'authority': 'ftp.is.co.za', 'host': 'ftp.is.co.za',
+            'net_path': '/rfc/rfc1808.txt'}
+    ),
+    ( 'ldap://[2001:db8::7]/c=GB?objectClass?one',
+    {'scheme': 'ldap', 'authority': '[2001:db8::7]', 'host': '[2001:db8::7]',
+            'net_path': '/c=GB', 'query': 'objectClass?one'}
+    ),
+    ( 'mailto:John.Doe@example.com',
+    {'scheme': 'mailto', 'opaque_part': 'John.Doe@example.com'}
+    ),
+    ( 'news:comp.infosystems.www.servers.unix',
+    {'scheme': 'news', 'opaque_part': 'comp.infosystems.www.servers.unix'}
+    ),
+    ( 'tel:+1-816-555-1212',
+    {'scheme': 'tel', 'opaque_part': '+1-816-555-1212'}
+    ),
+    ( 'telnet://192.0.2.16:80/',
+    {'scheme': 'telnet', 'authority': '192.0.2.16:80', 'host': '192.0.2.16',
+            'port': '80', 'net_path': '/'}
+    ),
+    ( 'urn:oasis:names:specification:docbook:dtd:xml:4.1.2',
+    {'scheme': 'urn', 'opaque_part': 'oasis:names:specification:docbook:dtd:xml:4.1.2'}
+    ),
+    ( 'http://[::1]:8080/index.html?q#top',
+    {'scheme': 'http', 'authority': '[::1]:8080', 'host': '[::1]', 'port': '8080',
+            'net_path': '/index.html', 'query': 'q', 'fragment': 'top'}
+    ),
+    ( 'https://[::ffff:192.0.2.128]/',
+    {'scheme': 'https', 'authority': '[::ffff:192.0.2.128]',
+            'host': '[::ffff:192.0.2.128]', 'net_path': '/'}
+    ),
+    ( '//user:pw@[v7.host:name]:/',
+    {'authority': 'user:pw@[v7.host:name]:', 'userinfo': 'user:pw',
+            'host': '[v7.host:name]', 'net_path': '/'}
+    ),
+    ( 'http://example.org',
+    {'scheme': 'http', 'authority': 'example.org', 'host': 'example.org'}
+    ),
+    ( 'mailto:mailbox@example.org?subject=hi',
+    {'scheme': 'mailto', 'opaque_part': 'mailbox@example.org', 'query': 'subject=hi'}
+    ),
+    ( 'a/b:c?q',
+    {'rel_path': 'a/b:c', 'query': 'q'}
+    ),
+    ( '?query#fragment',
+    {'query': 'query', 'fragment': 'fragment'}
+    ),
+    ( 'http://a+b/c+d?q=1+2',
+    {'scheme': 'http', 'authority': 'a+b', 'host': 'a+b', 'net_path': '/c+d',
+            'query': 'q=1+2'}
+    ),
+    ( 'x:a?q=1+2#f+g',
+    {'scheme': 'x', 'opaque_part': 'a', 'query': 'q=1+2', 'fragment': 'f+g'}
+    ),
+]
+
+normalize_urls = [
+    ( 'HTTP://www.Example.COM/', 'http://www.example.com/' ),
+    ( 'http://example.com/%7Efoo/%7ebar', 'http://example.com/~foo/~bar' ),
+    ( 'http://example.com/a%c2%b1b', 'http://example.com/a%C2%B1b' ),
+    ( 'http://example.com/%2e%2E/a', 'http://example.com/a' ),
+    ( 'http://Example.com:80', 'http://example.com/' ),
+    ( 'http://example.com:/?q', 'http://example.com/?q' ),
+    ( 'https://example.com:443/', 'https://example.com/' ),
+    ( 'https://example.com:80/', 'https://example.com:80/' ),
+    ( 'ftp://ftp.example.com:21/pub/./../a/', 'ftp://ftp.example.com/a/' ),
+    ( 'eXAMPLE://a/./b/../b/%63/%7bfoo%7d', 'example://a/b/c/%7Bfoo%7D' ),
+    ( 'example://a', 'example://a' ),
+    ( 'https://u%3asER@Host:8443/x', 'https://u%3AsER@host:8443/x' ),
+    ( 'http://%4A.example.com/', 'http://j.example.com/' ),
+    ( 'http://%4a%2E%c3%a9.Example.COM/', 'http://j.%C3%A9.example.com/' ),
+    ( 'http://[2001:DB8::7]/', 'http://[2001:db8::7]/' ),
+    ( 'mailto:Joe@Example.COM', 'mailto:Joe@Example.COM' ),
+    ( 'urn:ISBN:%30-486', 'urn:ISBN:0-486' ),
+    ( '//H/a/..', '//h/' ),
+    ( '/a/b/c/./../../g', '/a/g' ),
+    ( '../a/./b', '../a/./b' ),
+    ( '/a/../b?q=%7e#F%6f', '/b?q=~#Fo' ),
+    ( '?%41#', '?A#' ),
+]
+
+resolve_base = 'http://a/b/c/d;p?q'
+"The base URI for `resolve_urls`, from RFC 3986 section 5.4. "
 
+resolve_urls = [
+    # RFC 3986 section 5.4.1, normal examples
+    ( 'g:h', 'g:h' ),
+    ( 'g', 'http://a/b/c/g' ),
+    ( './g', 'http://a/b/c/g' ),
+    ( 'g/', 'http://a/b/c/g/' ),
+    ( '/g', 'http://a/g' ),
+    ( '//g', 'http://g' ),
+    ( '?y', 'http://a/b/c/d;p?y' ),
+    ( 'g?y', 'http://a/b/c/g?y' ),
+    ( '#s', 'http://a/b/c/d;p?q#s' ),
+    ( 'g#s', 'http://a/b/c/g#s' ),
+    ( 'g?y#s', 'http://a/b/c/g?y#s' ),
+    ( ';x', 'http://a/b/c/;x' ),
+    ( 'g;x', 'http://a/b/c/g;x' ),
+    ( 'g;x?y#s', 'http://a/b/c/g;x?y#s' ),
+    ( '', 'http://a/b/c/d;p?q' ),
+    ( '.', 'http://a/b/c/' ),
+    ( './', 'http://a/b/c/' ),
+    ( '..', 'http://a/b/' ),
+    ( '../', 'http://a/b/' ),
+    ( '../g', 'http://a/b/g' ),
+    ( '../..', 'http://a/' ),
+    ( '../../', 'http://a/' ),
+    ( '../../g', 'http://a/g' ),
+    # RFC 3986 section 5.4.2, abnormal examples
+    ( '../../../g', 'http://a/g' ),
+    ( '../../../../g', 'http://a/g' ),
+    ( '/./g', 'http://a/g' ),
+    ( '/../g', 'http://a/g' ),
+    ( 'g.', 'http://a/b/c/g.' ),
+    ( '.g', 'http://a/b/c/.g' ),
+    ( 'g..', 'http://a/b/c/g..' ),
+    ( '..g', 'http://a/b/c/..g' ),
+    ( './../g', 'http://a/b/g' ),
+    ( './g/.', 'http://a/b/c/g/' ),
+    ( 'g/./h', 'http://a/b/c/g/h' ),
+    ( 'g/../h', 'http://a/b/c/h' ),
+    ( 'g;x=1/./y', 'http://a/b/c/g;x=1/y' ),
+    ( 'g;x=1/../y', 'http://a/b/c/y' ),
+    ( 'g?y/./x', 'http://a/b/c/g?y/./x' ),
+    ( 'g?y/../x', 'http://a/b/c/g?y/../x' ),
+    ( 'g#s/./x', 'http://a/b/c/g#s/./x' ),
+    ( 'g#s/../x', 'http://a/b/c/g#s/../x' ),
+    ( 'http:g', 'http:g' ),
+]
+
+resolve_rootless_urls = [
+    # reference, target, and a base with a rootless path: after its first
+    # segment is removed the path starts with '/' (RFC 3986 section 5.2.4)
+    ( '../g', 'a:/g', 'a:b/c' ),
+    ( '../../g', 'a:/g', 'a:b/c' ),
+    ( '..', 'a:/', 'a:b/c' ),
+    ( '.', 'a:b/', 'a:b/c' ),
+    ( './', 'a:b/', 'a:b/c' ),
+    ( 'g', 'a:b/g', 'a:b/c' ),
+    ( 'd/./e/../f', 'a:b/d/f', 'a:b/c' ),
+    ( '/g/../h', 'a:/h', 'a:b/c' ),
+    ( '?y', 'a:b/c?y', 'a:b/c' ),
+    ( 'g/../h', 'urn:/h', 'urn:x:y' ),
+    ( '../g', 'urn:g', 'urn:x:y' ),
+    ( '#f', 'urn:x:y#f', 'urn:x:y' ),
+    ( '../a', 'x:/a', 'x:a/b' ),
+    ( '../../d/..', 'x:/', 'x:a/b/c' ),
+]
+
+public_suffix_hosts = [
+    # host, registered domain, and without private domains
+    ( 'example.com', 'example.com', 'example.com' ),
+    ( 'WWW.Example.COM', 'example.com', 'example.com' ),
+    ( 'www.example.com.', 'example.com', 'example.com' ),
+    ( 'com', None, None ),
+    ( 'www.example.co.uk', 'example.co.uk', 'example.co.uk' ),
+    ( 'co.uk', None, None ),
+    ( 'example.uk', 'example.uk', 'example.uk' ),
+    ( 'a.b.kyoto.jp', 'b.kyoto.jp', 'b.kyoto.jp' ),
+    ( 'kyoto.jp', None, None ),
+    ( 'test.kawasaki.jp', None, None ),
+    ( 'b.test.kawasaki.jp', 'b.test.kawasaki.jp', 'b.test.kawasaki.jp' ),
+    ( 'city.kawasaki.jp', 'city.kawasaki.jp', 'city.kawasaki.jp' ),
+    ( 'www.city.kawasaki.jp', 'city.kawasaki.jp', 'city.kawasaki.jp' ),
+    ( 'ck', None, None ),
+    ( 'test.ck', None, None ),
+    ( 'a.b.test.ck', 'b.test.ck', 'b.test.ck' ),
+    ( 'www.ck', 'www.ck', 'www.ck' ),
+    ( 'www.www.ck', 'www.ck', 'www.ck' ),
+    ( 'shishi.xn--55qx5d.cn', 'shishi.xn--55qx5d.cn', 'shishi.xn--55qx5d.cn' ),
+    ( 'xn--55qx5d.cn', None, None ),
+    ( 'a.example.unlisted', 'example.unlisted', 'example.unlisted' ),
+    ( 'user.github.io', 'user.github.io', 'github.io' ),
+    ( 'a.user.blogspot.co.uk', 'user.blogspot.co.uk', 'blogspot.co.uk' ),
+    ( '192.0.2.1', None, None ),
+    ( '[2001:db8::7]', None, None ),
+]
+
+onsamedomain_urls = [
+    # two URLs, on the same domain with the test list and with no list
+    ( 'http://a.co.uk/', 'http://b.co.uk/', False, True ),
+    ( 'http://www.example.co.uk/', 'https://example.co.uk:8443/x', True, True ),
+    ( 'http://a.example.com/', 'http://b.example.org/', False, False ),
+    ( 'http://example.com:80/', 'http://www.example.com/', True, True ),
+    ( 'http://localhost/', 'http://localhost:8080/', True, True ),
+    ( 'http://localhost/', 'http://otherhost/', False, False ),
+    ( 'http://192.0.2.1/a', 'http://192.0.2.1/b', True, True ),
+    ( '/path', '/path', False, False ),
+]
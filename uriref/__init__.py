@@ -83,8 +83,9 @@ Usage of this module
 --------------------
 Most importantly, this module provides the compiled expressions `relativeURI`
 and `absoluteURI` to match the respective reference notations. Function `match`
-takes any reference and uses the compiled expression `scheme` to determine
-if the string represents a relative or absolute reference.
+takes any reference and matches it with `URI_reference`, which determines
+from the scheme prefix if the string represents a relative or absolute
+reference and decomposes it in the same pass.
 New RegEx objects (to match other identifer(s)-parts) my be created using string
 formatting. All partial expressions (mostly translated BNF terms) reside in
 `partial_expressions`, while `grouped_partial_expressions` adds Id's for some
@@ -114,6 +115,12 @@ Patterns are named after their BNF terms and kept in dictionaries.
   which is merged into `expressions`.
 - `grouped_partial_expressions` adds some match group id's to the partial
   expressions, `grouped_expressions` contains the merged form of these.
+- The module's own regexes are built from the `*_possessive` variants of
+  these dictionaries (see `possessive`), the public ones use only greedy
+  quantifiers.
+
+The merged dictionaries and compiled regex objects (see `regex_templates`)
+are created on first access of the module attribute, not at import.
 
 The parts in these dictionaries can used to build your own custom regex's
 for URI matching. For example, to match `mysql://` style links one could
@@ -177,7 +184,10 @@ Misc.
 -----
 - TODO: better parsing of paths, parameters, testing.
 - XXX: stdlib 'urlparse' only allows parameters on the last path segment.
-- TODO: update to RFC 3986
+- The RFC 3986 grammar is available as `rfc3986_partial_expressions`, and the
+  `rfc3986_` prefixed regexes. Select it with the `grammar` argument of
+  `match` and the other functions, or set `default_grammar`. Its groups use
+  the RFC 2396 names (see `rfc3986_grouped_partial_expressions`).
 
 
 References
@@ -188,18 +198,26 @@ References
               T. Berners-Lee et al., 2005 <http://tools.ietf.org/html/rfc3986>
 
 """
+import array
+import copyreg
+import functools
+import itertools
 import re
-import urllib
+import string
+import sys
+import urllib.parse
 
-from . import util
+from . import scanner, util
 
 
 # Expressions
 """
 A dictionary of Regular Expressions as transcribed from RFC 2396 BNF,
-parts are referenced using Python's string formatting notation.
+parts are referenced using Python's string formatting notation. These use
+possessive quantifiers, `partial_expressions` is the same with greedy ones
+(see `possessive`).
 """
-partial_expressions = {
+partial_expressions_possessive = {
 	# RFC 2396 1.6.
 	'alpha': r"%(lowalpha)s%(upalpha)s",
 	'lowalpha': r"a-z",
@@ -217,39 +235,40 @@ partial_expressions = {
 	# RFC 2396 3.
 	'net_path': r"// %(authority)s %(abs_path)s",
 	'hier_part': r"( (%(net_path)s) | (%(abs_path)s) ) (\? %(query)s )?",
-	'opaque_part': r"%(uric_no_slash)s %(uric)s*",
+	'opaque_part': r"%(uric_no_slash)s %(uric)s*+",
 	# RFC 2396 3.1.
-	'scheme': r"[%(alpha)s] [- + \. %(alpha)s %(digit)s]*",
+	'scheme': r"[%(alpha)s] [- + \. %(alpha)s %(digit)s]*+",
 	# RFC 2396 3.2.
 	'authority': r"%(server)s | %(reg_name)s",
 	# RFC 2396 3.2.1.
-	'reg_name': r"[%(unreserved)s %(escaped)s $ , ; : & = +]*",
+	'reg_name': r"[%(unreserved)s %(escaped)s $ , ; : & = +]*+",
 	# RFC 2396 3.2.2.
 	'server': r"(%(userinfo)s @)? %(hostport)s",
-	'userinfo': r"[%(unreserved)s %(escaped)s $ , ; : & = +]*",
+	'userinfo': r"[%(unreserved)s %(escaped)s $ , ; : & = +]*+",
 	'hostport': r"%(host)s ( : %(port)s )?",
 	'host': r"( %(hostname)s | %(IPv4address)s )",
 	'hostname': r"(%(domainlabel)s \.)* %(toplabel)s (\.)? ", # RFC 2396 says there can be a trailing "." for local domains
-	'domainlabel': r"([%(alphanum)s] | ([%(alphanum)s][-%(alphanum)s]*[%(alphanum)s]))",
-	'toplabel': r"([%(alpha)s] | ([%(alpha)s] [-%(alphanum)s]* [%(alphanum)s]))",
-	'IPv4address': r"([0-9]+ \. [0-9]+ \. [0-9]+ \. [0-9]+)",
-	'port': r"[0-9]+",
+	# labels start and end with alphanum, the lookbehind rejects a trailing '-'
+	'domainlabel': r"([%(alphanum)s] ([-%(alphanum)s]++ (?<=[%(alphanum)s]))?)",
+	'toplabel': r"([%(alpha)s] ([-%(alphanum)s]++ (?<=[%(alphanum)s]))?)",
+	'IPv4address': r"([0-9]++ \. [0-9]++ \. [0-9]++ \. [0-9]++)",
+	'port': r"[0-9]++",
 	# RFC 2396 3.3. Path Component
 	# XXX: difference here
 	#'path': r"( %(abs_path)s | %(opaque_part)s )",
 	'pchar': r"[%(unreserved)s%(escaped)s:@&=+$,]",
-	'segment': r"(%(pchar)s* (; %(param)s)*)",
+	'segment': r"(%(pchar)s*+ (; %(param)s)*)",
 	'path_segments': r"(%(segment)s) (/ %(segment)s)*",
 	'abs_path': r"/ %(path_segments)s",
-	'param': r"%(pchar)s*",
+	'param': r"%(pchar)s*+",
 	# RFC 2396 3.4. Query Component
-	'query': r"%(uric)s*",
+	'query': r"%(uric)s*+",
 	# RFC 2396 4., RFC 2396 5.
 	'relativeURI': r"((%(net_path)s) | (%(abs_path)s) | (%(rel_path)s) | (%(opaque_part)s)) (\? %(query)s)?",
 	'absoluteURI': r"%(scheme)s : (%(hier_part)s) | (%(opaque_part)s)",
 	'URI_reference': r"((%(absoluteURI)s | %(relativeURI)s) (\# %(fragment)s)?)",
 	# RFC 2396 4.1.
-	'fragment': r"%(uric)s*",
+	'fragment': r"%(uric)s*+",
 	# Other
 	'mark': r"- _ \. ! ~ * ' ( )",
 	'rel_segment': r"[ %(unreserved)s %(escaped)s ; @ & = + $ ,]{1}",
@@ -257,81 +276,426 @@ partial_expressions = {
 	'uric_no_slash': r"[%(unreserved)s %(escaped)s ; ? : @ & = + $ ,]",
 }
 
+_string_reference = re.compile(r"%(?:%|\((\w+)\)s)")
+
+def string_references(string):
+	"Return the set of names referenced with `%(name)s` formatting in `string`. "
+	names = set(_string_reference.findall(string))
+	names.discard('')
+	return names
+
+def merge_order(strings):
+	"""
+	Return the names in dictionary `strings` sorted so that each string comes
+	after the strings it references.
+
+	Raises ValueError naming the terms with references to non-existing names,
+	or a cycle of terms that reference each other.
+	"""
+
+	references = dict([ (name, string_references(string))
+		for name, string in strings.items() ])
+
+	missing = [ "%s (in %s)" % (', '.join(sorted(names - set(strings))), name)
+		for name, names in references.items() if names - set(strings) ]
+	if missing:
+		raise ValueError("Cannot resolve missing term(s): %s" % '; '.join(missing))
+
+	# Kahn's algorithm: start with terms that reference nothing
+	dependents = dict([ (name, []) for name in strings ])
+	pending = {}
+	for name, names in references.items():
+		pending[name] = len(names)
+		for ref in names:
+			dependents[ref].append(name)
+	order = [ name for name in strings if not pending[name] ]
+	for name in order:
+		for dependent in dependents[name]:
+			pending[dependent] -= 1
+			if not pending[dependent]:
+				order.append(dependent)
+
+	if len(order) < len(strings):
+		# follow unresolved references until a term repeats to report a cycle
+		unresolved = set(strings) - set(order)
+		path = [ min(unresolved) ]
+		while path.count(path[-1]) < 2:
+			path.append(min(references[path[-1]] & unresolved))
+		cycle = path[path.index(path[-1]):]
+		raise ValueError("Cannot resolve cyclic term(s): %s" % ' -> '.join(cycle))
+
+	return order
+
 def merge_strings(strings):
 	"""
 	Format every string in dictionary `strings` using the same dictionary until
 	every string has been formatted (merged). Returns a dictionary with all
 	string formatting references replaced.
 
-	Important! More than one non-existing formatting reference will cause an infinite loop.
+	Each string is formatted once, in the order given by `merge_order`.
 	"""
 
 	results = {}
-
-	names = list(strings.keys())
-	while names:
-		# cycle through the list until all strings are resolved
-		name = names.pop(0)
-		try:
-			results[name] = (strings[name] % results)
-		except Exception as e:
-			names.append(name)
-			# one unformatted string left while every other string is merged:
-			assert name != names[0], 'Cannot resolve %s' % name
-
+	for name in merge_order(strings):
+		results[name] = strings[name] % results
 	return results
 
-# Merge unformatted strings
-expressions = merge_strings(partial_expressions)
+def merge_sizes(strings, merged=None):
+	"""
+	Return a dictionary with the length of each string in `strings` before and
+	after merging, as (partial, expanded) tuple. This shows which BNF terms
+	make for the largest regexes.
+	"""
+
+	if merged is None:
+		merged = merge_strings(strings)
+	return dict([ (name, (len(strings[name]), len(merged[name])))
+		for name in strings ])
 
 
 # Give some regex groups an ID
-grouped_partial_expressions = {
-	'userinfo': r"(?P<userinfo> [%(unreserved)s %(escaped)s ; : & = + $ ,]*)",
-	'port': r"(?P<port> [0-9]*)",
+grouped_partial_expressions_possessive = {
+	'userinfo': r"(?P<userinfo> [%(unreserved)s %(escaped)s ; : & = + $ ,]*+)",
+	'port': r"(?P<port> [0-9]*+)",
 	'host': r"(?P<host> %(hostname)s | %(IPv4address)s)",
-	'query': r"(?P<query> %(uric)s*)",
+	'query': r"(?P<query> %(uric)s*+)",
 	'abs_path': r"/ %(path_segments)s",
 	'authority': r"(?P<authority> (%(server)s) | %(reg_name)s)",
 	'net_path': r"// %(authority)s (?P<net_path> %(abs_path)s)",
 	'hier_part': r"((%(net_path)s) | (?P<abs_path> %(abs_path)s)) (\? %(query)s)?",
-	'opaque_part': r"(?P<opaque_part> %(uric_no_slash)s %(uric)s*)",
-	'scheme': r"(?P<scheme> %s)" % partial_expressions['scheme'],
+	'opaque_part': r"(?P<opaque_part> %(uric_no_slash)s %(uric)s*+)",
+	'scheme': r"(?P<scheme> %s)" % partial_expressions_possessive['scheme'],
 	'relativeURI': r"((%(net_path)s) | (?P<abs_path> %(abs_path)s) | (?P<rel_path> %(rel_path)s) | (%(opaque_part)s)) (\? %(query)s)?",
 	'absoluteURI': r"%(scheme)s : (%(hier_part)s | %(opaque_part)s)",
+	# Single-pass reference: the scheme prefix decides between the absolute and
+	# relative alternatives (as `match_twopass` does), `rel_path` is only
+	# allowed without scheme.
+	'scheme_prefix': r"%s :" % partial_expressions_possessive['scheme'],
+	'URI_reference': r"(%(scheme)s : | (?! %(scheme_prefix)s)) ((%(net_path)s) | (?P<abs_path> %(abs_path)s) | (?(scheme) (?!) | (?P<rel_path> %(rel_path)s)) | (%(opaque_part)s)) (\? %(query)s)?",
+	# Leading parts of a reference only, the remainder is not matched
+	'URI_scheme': r"(%(scheme)s : | (?! %(scheme_prefix)s))",
+	'URI_authority': r"%(URI_scheme)s (// %(authority)s (?= /))?",
 }
-for k, e in partial_expressions.items():
-	grouped_partial_expressions.setdefault(k, e)
+for k, e in partial_expressions_possessive.items():
+	grouped_partial_expressions_possessive.setdefault(k, e)
+
+
+# RFC 3986 Expressions
+"""
+The same for RFC 3986 Appendix A, which obsoletes RFC 2396. Term names use
+'_' for '-'. Character classes are written without spaces (these would be
+literal characters in a verbose character class). Terms that are only
+substituted into a character class escape '+' and '?', which `greedy` would
+read as a possessive quantifier otherwise. Repeats of characters
+and pct-encoded octets are written as runs of characters separated by
+pct_encoded, ie. `[...]*+ (%(pct_encoded)s [...]*+)*+` for `*pchar`. This
+matches the same strings without nested repeats to backtrack over.
+"""
+rfc3986_partial_expressions_possessive = {
+	# RFC 3986 2.1.
+	'pct_encoded': r"%%[0-9A-Fa-f]{2}",
+	# RFC 3986 2.2.
+	'reserved': r"%(gen_delims)s%(sub_delims)s",
+	'gen_delims': r":/?\#\[\]@",
+	'sub_delims': r"!$&'()*\+,;=",
+	# RFC 3986 2.3.
+	'unreserved': r"A-Za-z0-9\-._~",
+	# RFC 3986 3.
+	'URI': r"%(scheme)s : (%(hier_part)s) (\? %(query)s)? (\# %(fragment)s)?",
+	'hier_part': r"// %(authority)s %(path_abempty)s | %(path_absolute)s | %(path_rootless)s | %(path_empty)s",
+	# RFC 3986 3.1.
+	'scheme': r"[A-Za-z][A-Za-z0-9+\-.]*+",
+	# RFC 3986 3.2.
+	'authority': r"(%(userinfo)s @)? %(host)s (: %(port)s)?",
+	# RFC 3986 3.2.1.
+	'userinfo': r"[%(unreserved)s%(sub_delims)s:]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s:]*+)*+",
+	# RFC 3986 3.2.2.
+	'host': r"(%(IP_literal)s | %(IPv4address)s | %(reg_name)s)",
+	'IP_literal': r"\[ (%(IPv6address)s | %(IPvFuture)s) \]",
+	'IPvFuture': r"v [0-9A-Fa-f]++ \. [%(unreserved)s%(sub_delims)s:]++",
+	'IPv6address': r"""(
+		(%(h16)s :){6} %(ls32)s
+		| :: (%(h16)s :){5} %(ls32)s
+		| (%(h16)s)? :: (%(h16)s :){4} %(ls32)s
+		| ((%(h16)s :){0,1} %(h16)s)? :: (%(h16)s :){3} %(ls32)s
+		| ((%(h16)s :){0,2} %(h16)s)? :: (%(h16)s :){2} %(ls32)s
+		| ((%(h16)s :){0,3} %(h16)s)? :: %(h16)s : %(ls32)s
+		| ((%(h16)s :){0,4} %(h16)s)? :: %(ls32)s
+		| ((%(h16)s :){0,5} %(h16)s)? :: %(h16)s
+		| ((%(h16)s :){0,6} %(h16)s)? ::
+	)""",
+	'h16': r"[0-9A-Fa-f]{1,4}",
+	'ls32': r"(%(h16)s : %(h16)s | %(IPv4address)s)",
+	'IPv4address': r"%(dec_octet)s \. %(dec_octet)s \. %(dec_octet)s \. %(dec_octet)s",
+	'dec_octet': r"(25[0-5] | 2[0-4][0-9] | 1[0-9][0-9] | [1-9][0-9] | [0-9])",
+	'reg_name': r"[%(unreserved)s%(sub_delims)s]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s]*+)*+",
+	# RFC 3986 3.2.3.
+	'port': r"[0-9]*+",
+	# RFC 3986 3.3.
+	'path_abempty': r"(/ %(segment)s)*+",
+	'path_absolute': r"/ (%(segment_nz)s (/ %(segment)s)*+)?",
+	'path_noscheme': r"%(segment_nz_nc)s (/ %(segment)s)*+",
+	'path_rootless': r"%(segment_nz)s (/ %(segment)s)*+",
+	'path_empty': r"",
+	'segment': r"[%(unreserved)s%(sub_delims)s:@]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s:@]*+)*+",
+	'segment_nz': r"%(pchar)s %(segment)s",
+	'segment_nz_nc': r"([%(unreserved)s%(sub_delims)s@] | %(pct_encoded)s) [%(unreserved)s%(sub_delims)s@]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s@]*+)*+",
+	'pchar': r"([%(unreserved)s%(sub_delims)s:@] | %(pct_encoded)s)",
+	# RFC 3986 3.4.
+	'query': r"[%(unreserved)s%(sub_delims)s:@/?]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s:@/?]*+)*+",
+	# RFC 3986 3.5.
+	'fragment': r"[%(unreserved)s%(sub_delims)s:@/?]*+ (%(pct_encoded)s [%(unreserved)s%(sub_delims)s:@/?]*+)*+",
+	# RFC 3986 4.1.
+	'URI_reference': r"((%(URI)s) | (%(relative_ref)s))",
+	# RFC 3986 4.2.
+	'relative_ref': r"(%(relative_part)s) (\? %(query)s)? (\# %(fragment)s)?",
+	'relative_part': r"// %(authority)s %(path_abempty)s | %(path_absolute)s | %(path_noscheme)s | %(path_empty)s",
+	# RFC 3986 4.3.
+	'absolute_URI': r"%(scheme)s : (%(hier_part)s) (\? %(query)s)?",
+}
+
+# The same group IDs as for RFC 2396: `net_path` is the path after an
+# authority (path-abempty), `abs_path` is path-absolute, `rel_path` is
+# path-noscheme and `opaque_part` is path-rootless. An empty path has no group.
+rfc3986_grouped_partial_expressions_possessive = {
+	'authority': r"(?P<authority> (%(userinfo)s @)? %(host)s (: %(port)s)?)",
+	'userinfo': r"(?P<userinfo> %s)" % rfc3986_partial_expressions_possessive['userinfo'],
+	'host': r"(?P<host> %(IP_literal)s | %(IPv4address)s | %(reg_name)s)",
+	'port': r"(?P<port> [0-9]*+)",
+	'scheme': r"(?P<scheme> %s)" % rfc3986_partial_expressions_possessive['scheme'],
+	'query': r"(?P<query> %s)" % rfc3986_partial_expressions_possessive['query'],
+	'hier_part': r"// %(authority)s (?P<net_path> %(path_abempty)s) | (?P<abs_path> %(path_absolute)s) | (?P<opaque_part> %(path_rootless)s) | %(path_empty)s",
+	'relative_part': r"// %(authority)s (?P<net_path> %(path_abempty)s) | (?P<abs_path> %(path_absolute)s) | (?P<rel_path> %(path_noscheme)s) | %(path_empty)s",
+	# Without fragment, as for RFC 2396 the templates add it
+	'relativeURI': r"(%(relative_part)s) (\? %(query)s)?",
+	'absoluteURI': r"%(scheme)s : (%(hier_part)s) (\? %(query)s)?",
+	# Single-pass reference, see `grouped_partial_expressions`
+	'scheme_prefix': r"%s :" % rfc3986_partial_expressions_possessive['scheme'],
+	'URI_reference': r"(%(scheme)s : | (?! %(scheme_prefix)s)) (// %(authority)s (?P<net_path> %(path_abempty)s) | (?P<abs_path> %(path_absolute)s) | (?(scheme) (?P<opaque_part> %(path_rootless)s) | (?P<rel_path> %(path_noscheme)s)) | %(path_empty)s) (\? %(query)s)?",
+	'URI_scheme': r"(%(scheme)s : | (?! %(scheme_prefix)s))",
+	'URI_authority': r"%(URI_scheme)s (// %(authority)s (?= [/?\#] | $))?",
+}
+for k, e in rfc3986_partial_expressions_possessive.items():
+	rfc3986_grouped_partial_expressions_possessive.setdefault(k, e)
+
+
+possessive = sys.version_info >= (3, 11)
+"""
+True if `re` supports possessive quantifiers and atomic groups (Python 3.11).
+The `*_possessive` expression dictionaries use possessive quantifiers where
+backtracking cannot give a match, which keeps the regexes from backtracking
+over long invalid input. The regex templates are formatted with these, or on
+older Python with the greedy ones (see `greedy`). These match the same
+references.
+
+The public dictionaries (`partial_expressions` etc.) always use greedy
+quantifiers, so that expressions composed from these backtrack as expected.
+"""
+
+_possessive = re.compile(r"(\\.|\[(?:\\.|[^]])+\])|([*+?}])\+|\(\?>")
+
+def greedy(pattern):
+	"Return `pattern` with possessive quantifiers and atomic groups replaced. "
+	def repl(m):
+		if m.group(1):
+			return m.group(1)
+		elif m.group(2):
+			return m.group(2)
+		return '(?:'
+	return _possessive.sub(repl, pattern)
+
+def greedy_strings(strings):
+	"Return a copy of dictionary `strings` with `greedy` applied to each string. "
+	return dict([ (k, greedy(e)) for k, e in strings.items() ])
+
+partial_expressions = greedy_strings(partial_expressions_possessive)
+grouped_partial_expressions = greedy_strings(grouped_partial_expressions_possessive)
+rfc3986_partial_expressions = greedy_strings(rfc3986_partial_expressions_possessive)
+rfc3986_grouped_partial_expressions = greedy_strings(
+		rfc3986_grouped_partial_expressions_possessive)
 
-# Merge unformatted strings
-grouped_expressions = merge_strings(grouped_partial_expressions)
+def _template_expressions(prefix):
+	"Return the merged expressions to format the regex templates of `prefix` with. "
+	if possessive:
+		return _lazy(prefix+'grouped_expressions_possessive')
+	return _lazy(prefix+'grouped_expressions')
 
 
 ### Regex objects for matching relative and absolute URIRef notations
 
-relativeURI_re = r"^%(relativeURI)s(\# (?P<fragment> %(fragment)s))?$" % grouped_expressions
-absoluteURI_re = r"^%(absoluteURI)s(\# (?P<fragment> %(fragment)s))?$" % grouped_expressions
+regex_templates = {
+	# a URI with no scheme-part and optional fragment part
+	'relativeURI': r"^%(relativeURI)s(\# (?P<fragment> %(fragment)s))?$",
+	# a URI with scheme-part and optional fragment part
+	'absoluteURI': r"^%(absoluteURI)s(\# (?P<fragment> %(fragment)s))?$",
+	# an absolute or relative URI with optional fragment part, matched in one pass
+	'URI_reference': r"^%(URI_reference)s(\# (?P<fragment> %(fragment)s))?$",
+	# matches an absolute path
+	'abs_path': r"^%(abs_path)s$",
+	# matches a full net_path, ie. //host/path
+	'net_path': r"^%(net_path)s$",
+	# matches the scheme part
+	'scheme': r"^%(scheme)s:",
+	# matches the scheme part and tests for a net_path
+	'net_scheme': r"^%(scheme)s:(\/\/)?",
+	# matches the scheme part of a reference, if any
+	'URI_scheme': r"^%(URI_scheme)s",
+	# matches the scheme and authority parts of a reference, if any
+	'URI_authority': r"^%(URI_authority)s",
+	# matches any character that cannot occur in a reference (see `InputGuard`)
+	'non_uric': r"[^%(unreserved)s%(reserved)s%(escaped)s\#]",
+	# an absolute URI with optional fragment, not anchored (see `uriref.extract`)
+	'embeddedURI': r"%(absoluteURI)s(\# (?P<fragment> %(fragment)s))?",
+}
+"""
+Templates for the compiled regex objects, formatted with `grouped_expressions`
+(or `grouped_expressions_possessive`, see `possessive`).
+Each is available as module attribute by the same name, and the formatted
+string with suffix '_re' (ie. `absoluteURI_re`). With suffix '_validator'
+a regex object without capturing groups is available (see `noncapturing`),
+and with suffix '_bytes' the same regex for bytes (ie. `absoluteURI_bytes`).
+"""
 
-relativeURI = re.compile(relativeURI_re, re.VERBOSE)
-"a URI with no scheme-part and optional fragment part"
+rfc3986_regex_templates = {
+	'relativeURI': r"^%(relativeURI)s(\# (?P<fragment> %(fragment)s))?$",
+	'absoluteURI': r"^%(absoluteURI)s(\# (?P<fragment> %(fragment)s))?$",
+	'URI_reference': r"^%(URI_reference)s(\# (?P<fragment> %(fragment)s))?$",
+	'abs_path': r"^%(path_absolute)s$",
+	'net_path': r"^// %(authority)s %(path_abempty)s$",
+	'scheme': r"^%(scheme)s:",
+	'net_scheme': r"^%(scheme)s:(\/\/)?",
+	'URI_scheme': r"^%(URI_scheme)s",
+	'URI_authority': r"^%(URI_authority)s",
+	'non_uric': r"[^%(unreserved)s%(reserved)s%%]",
+	'embeddedURI': r"%(absoluteURI)s(\# (?P<fragment> %(fragment)s))?",
+}
+"The same templates for `rfc3986_grouped_expressions`. "
+
+grammars = {
+	'rfc2396': '',
+	'rfc3986': 'rfc3986_',
+}
+"""
+The module attribute prefix for each grammar. The expression dictionaries
+and regex templates, and the attributes created from these, are named with
+the prefix (ie. `rfc3986_URI_reference`).
+"""
 
-absoluteURI = re.compile(absoluteURI_re, re.VERBOSE)
-"a URI with scheme-part and optional fragment part"
+default_grammar = 'rfc2396'
+"The grammar used by `match` and the other functions if none is given. "
 
+def _prefix(grammar):
+	"Return the attribute prefix for `grammar`, or for the default grammar. "
+	try:
+		return grammars[grammar or default_grammar]
+	except KeyError:
+		raise ValueError("Unknown grammar %r" % grammar)
 
-### Regex objects of URIRef strings
 
-abs_path = re.compile(r"^%(abs_path)s$" % grouped_expressions, re.VERBOSE)
-"matches an absolute path"
+def noncapturing(pattern, keep=()):
+	"""
+	Return regex string `pattern` with every group made non-capturing, except
+	named groups listed in `keep` or tested by a conditional `(?(name)...)`.
+	Without groups to track the engine only needs to answer match or no match.
+	"""
 
-net_path = re.compile(r"^%(net_path)s$" % grouped_expressions, re.VERBOSE)
-"matches a full net_path, ie. //host/path "
+	keep = set(keep) | set(re.findall(r"\(\?\((\w+)\)", pattern))
+	out = []
+	i, end = 0, len(pattern)
+	while i < end:
+		c = pattern[i]
+		if c == '\\':
+			out.append(pattern[i:i+2])
+			i += 2
+			continue
+		if c == '[':
+			# copy character class, parenthesis are literal in there
+			j = i + 1
+			while pattern[j] != ']' or j == i + 1:
+				j += 2 if pattern[j] == '\\' else 1
+			out.append(pattern[i:j+1])
+			i = j + 1
+			continue
+		if c == '(':
+			if pattern.startswith('(?(', i):
+				# conditional, copy the group reference
+				j = pattern.index(')', i)
+				out.append(pattern[i:j+1])
+				i = j + 1
+				continue
+			elif pattern.startswith('(?P<', i):
+				j = pattern.index('>', i)
+				if pattern[i+4:j] not in keep:
+					out.append('(?:')
+					i = j + 1
+					continue
+			elif not pattern.startswith('(?', i):
+				out.append('(?:')
+				i += 1
+				continue
+		out.append(c)
+		i += 1
+	return ''.join(out)
+
+
+def __getattr__(name):
+	"""
+	Merge the expression dictionaries and compile the regex objects on first
+	access, after which they are regular module attributes. This keeps
+	`import uriref` cheap.
+	"""
 
-scheme = re.compile(r"^%(scheme)s:" % grouped_expressions, re.VERBOSE)
-"matches the scheme part"
+	for prefix in grammars.values():
+		if prefix and name.startswith(prefix):
+			break
+	else:
+		prefix = ''
+	base = name[len(prefix):]
+	templates = globals()[prefix+'regex_templates']
+	if base in ('expressions', 'grouped_expressions', 'expressions_possessive',
+			'grouped_expressions_possessive'):
+		value = merge_strings(globals()[prefix+base.replace('expressions',
+			'partial_expressions', 1)])
+	elif base in templates:
+		value = re.compile(_lazy(name+'_re'), re.VERBOSE)
+	elif base.endswith('_re') and base[:-3] in templates:
+		value = templates[base[:-3]] % _template_expressions(prefix)
+	elif base.endswith('_validator') and base[:-10] in templates:
+		value = re.compile(noncapturing(_lazy(name[:-10]+'_re')), re.VERBOSE)
+	elif base.endswith('_bytes') and (base[:-6] in templates or
+			base[:-6].endswith('_validator') and base[:-16] in templates):
+		value = re.compile(_lazy(name[:-6]).pattern.encode('ascii'), re.VERBOSE)
+	else:
+		raise AttributeError("module %r has no attribute %r" % (__name__, name))
+	globals()[name] = value
+	return value
+
+def __dir__():
+	names = set(globals())
+	for prefix in grammars.values():
+		templates = globals()[prefix+'regex_templates']
+		names.update([ prefix+name for name in ('expressions', 'grouped_expressions',
+			'expressions_possessive', 'grouped_expressions_possessive') ])
+		names.update([ prefix+name for name in templates ])
+		names.update([ prefix+name+'_re' for name in templates ])
+		names.update([ prefix+name+'_validator' for name in templates ])
+		names.update([ prefix+name+'_bytes' for name in templates ])
+		names.update([ prefix+name+'_validator_bytes' for name in templates ])
+	return sorted(names)
+
+def _lazy(name):
+	"Module attribute `name`, merging or compiling it if needed. "
+	try:
+		return globals()[name]
+	except KeyError:
+		return __getattr__(name)
+
+def _suffix(uriref):
+	"Return the attribute suffix of the regexes to match `uriref` with. "
+	if isinstance(uriref, str):
+		return ''
+	return '_bytes'
 
-net_scheme = re.compile(r"^%(scheme)s:(\/\/)?" % grouped_expressions, re.VERBOSE)
-"matches the scheme part and tests for a net_path"
 
 ###
 
@@ -340,20 +704,839 @@ class MalformedURLExpection(Exception):
 
 ### Functions to validate and parse URIRef strings
 
-def match(uriref):
+def match(uriref, engine=None, guard=None, grammar=None):
 	"""
 	Match given `uriref` string using a Regular Expression.
 
 	If the passed in string starts with a valid scheme sequence it is treated as
-	an absolute-URI, otherwise a relative one.
+	an absolute-URI, otherwise a relative one. Both cases are handled by the
+	single `URI_reference` expression, groups that do not apply are None.
+
+	Returns the match object or None. If `parse_cache` is set, results are
+	looked up there first.
+
+	`engine` selects one of `engines`, the default is `default_engine`. The
+	'scanner' engine splits on delimiters and does not validate, it only
+	supports the 'rfc2396' grammar and is slower than the regex, see
+	`uriref.scanner`. The parse cache only applies to the 'regex' engine.
+
+	If `guard` (default `input_guard`) is set, references it rejects are not
+	matched and None is returned. Pass False to skip the default guard.
+
+	The regex engine matches with the expressions of one of the `grammars`,
+	the default is `default_grammar`.
+
+	Bytes-like references (bytes, bytearray, memoryview or mmap) are matched
+	with the `_bytes` regexes without decoding, the groups are bytes. These
+	are not cached, and not supported by the scanner engine.
+	"""
+
+	if guard is None:
+		guard = input_guard
+	if guard and guard.check(uriref):
+		return None
+	if not isinstance(uriref, str):
+		if engine not in (None, 'regex'):
+			raise TypeError("Engine %r cannot match bytes-like references" % engine)
+		return _lazy(_prefix(grammar)+'URI_reference_bytes').match(uriref)
+	if engine is None:
+		engine = default_engine
+	if engine != 'regex':
+		return engines[engine](uriref, grammar or default_grammar)
+	prefix = _prefix(grammar)
+	if parse_cache is not None:
+		return parse_cache.match(uriref, prefix)
+	return _lazy(prefix+'URI_reference').match(uriref)
+
+
+def match_twopass(uriref, grammar=None):
+	"""
+	Like `match`, but probe for a scheme first and then match `absoluteURI`
+	or `relativeURI`. This scans absolute references twice, and is kept for
+	comparison.
+	"""
+
+	prefix, suffix = _prefix(grammar), _suffix(uriref)
+	if _lazy(prefix+'scheme'+suffix).match(uriref):
+		return _lazy(prefix+'absoluteURI'+suffix).match(uriref)
+	else:
+		return _lazy(prefix+'relativeURI'+suffix).match(uriref)
+
+
+engines = {
+	'regex': lambda uriref, grammar=None: _lazy(_prefix(grammar)+'URI_reference').match(uriref),
+	'scanner': scanner.split,
+}
+"""
+Match functions by engine name, called with the reference and the grammar
+name. Each returns a match object or None. The scanner raises ValueError for
+grammars other than 'rfc2396'. The 'regex' engine is the fastest.
+"""
+
+default_engine = 'regex'
+"The engine used by `match` and the batch functions if none is given. "
+
+
+### Field selective matching
+
+prefix_parts = (
+	('URI_scheme', frozenset(('scheme',))),
+	('URI_authority', frozenset(('scheme', 'authority', 'userinfo', 'host', 'port'))),
+)
+"Regex templates that match a reference only up to the given parts. "
+
+_field_regexes = {}
+
+def compile_for(fields, validate=False, grammar=None, binary=False):
+	"""
+	Return a regex object like `URI_reference` that only captures the groups
+	named in `fields`, the other groups are made non-capturing. Regex objects
+	are compiled once for each set of fields and grammar.
+
+	Unless `validate` is set, matching stops after the last part needed if
+	`fields` are only leading parts (see `prefix_parts`). These regexes match
+	any string, the remainder of the reference is not validated.
+
+	With `binary` a bytes regex is returned, for bytes-like references.
+	"""
+
+	if isinstance(fields, str):
+		fields = (fields,)
+	fields = frozenset(fields)
+	prefix = _prefix(grammar)
+	key = fields, validate, prefix, binary
+	if key in _field_regexes:
+		return _field_regexes[key]
+
+	unknown = fields - set(parts)
+	if unknown:
+		raise ValueError("Unknown URI part(s) %s" % ', '.join(sorted(unknown)))
+	name = 'URI_reference'
+	if not validate:
+		for template, template_fields in prefix_parts:
+			if fields <= template_fields:
+				name = template
+				break
+	pattern = noncapturing(_lazy(prefix+name+'_re'), keep=fields)
+	if binary:
+		pattern = pattern.encode('ascii')
+	regex = re.compile(pattern, re.VERBOSE)
+	_field_regexes[key] = regex
+	return regex
+
+
+### Validation
+
+def is_valid(uriref, grammar=None):
+	"Return True if `uriref` is a valid absolute or relative reference. "
+	validator = _lazy(_prefix(grammar)+'URI_reference_validator'+_suffix(uriref))
+	return validator.match(uriref) is not None
+
+def is_absolute(uriref, grammar=None):
+	"Return True if `uriref` is a valid absolute reference. "
+	validator = _lazy(_prefix(grammar)+'absoluteURI_validator'+_suffix(uriref))
+	return validator.match(uriref) is not None
+
+def is_relative(uriref, grammar=None):
+	"Return True if `uriref` is a valid relative reference. "
+	validator = _lazy(_prefix(grammar)+'relativeURI_validator'+_suffix(uriref))
+	return validator.match(uriref) is not None
+
+
+### Parse cache
+
+class ParseCache(object):
+
+	"""
+	Bounded cache of `match` results keyed by reference string, discarding the
+	least recently used entry when `maxsize` is reached. Lookups are thread-safe
+	(using functools.lru_cache). Match objects are immutable, and each
+	`groupdict()` call returns a new dictionary, so cached results can be shared.
+
+	Both malformed (None) and valid results are cached.
+	"""
+
+	def __init__(self, maxsize=65536):
+		self.maxsize = maxsize
+		self.match = functools.lru_cache(maxsize)(self._match)
+		"Cached match, by reference and grammar prefix (see `grammars`). "
+
+	@staticmethod
+	def _match(uriref, prefix):
+		return _lazy(prefix+'URI_reference').match(uriref)
+
+	def stats(self):
+		"""
+		Return a dictionary with hit, miss and eviction counts, and the current
+		and maximum size. Concurrent misses for the same key count once in size,
+		so evictions are overestimated by one for each such race.
+		"""
+		info = self.match.cache_info()
+		return dict(hits=info.hits, misses=info.misses,
+				evictions=info.misses - info.currsize,
+				size=info.currsize, maxsize=info.maxsize)
+
+	def clear(self):
+		"Drop all entries and reset the counters. "
+		self.match.cache_clear()
+
+	def __len__(self):
+		return self.match.cache_info().currsize
+
+
+parse_cache = None
+"The ParseCache used by `match`, `urlparse` and `URIRef`, if enabled. "
+
+def enable_cache(maxsize=65536):
+	"Set and return a new `parse_cache` with `maxsize` entries. "
+	global parse_cache
+	parse_cache = ParseCache(maxsize)
+	return parse_cache
+
+def disable_cache():
+	"Stop caching `match` results. "
+	global parse_cache
+	parse_cache = None
+
+
+### Input guard
+
+class InputGuard(object):
+
+	"""
+	Cheap checks in front of the regex match: a maximum length, and a single
+	scan for characters that cannot occur in any reference (anything but
+	`uric` and '#', see the `non_uric` regex). Rejections are counted by
+	reason in `rejections`. The character set is that of `grammar`, or of the
+	default grammar when the guard is created.
+
+	Passing the guard does not make a reference valid, it only keeps obvious
+	junk away from the expensive match.
+	"""
+
+	LENGTH = 'length'
+	CHARACTER = 'character'
+	reasons = (LENGTH, CHARACTER)
+
+	def __init__(self, max_length=8192, grammar=None):
+		self.max_length = max_length
+		self.rejections = dict.fromkeys(self.reasons, 0)
+		"Count of rejected references per reason. "
+		self._prefix = _prefix(grammar)
+		self._search = _lazy(self._prefix+'non_uric').search
+
+	def check(self, uriref):
+		"""
+		Return None if `uriref` passes, or the reason it is rejected. Bytes-like
+		references are checked in bytes.
+		"""
+		search = self._search
+		if not isinstance(uriref, str):
+			search = _lazy(self._prefix+'non_uric_bytes').search
+		if len(uriref) > self.max_length:
+			reason = self.LENGTH
+		elif search(uriref):
+			reason = self.CHARACTER
+		else:
+			return None
+		self.rejections[reason] += 1
+		return reason
+
+	def guarded(self, match):
+		"Wrap match function `match` to return None for rejected references. "
+		check = self.check
+		def guarded_match(uriref):
+			if check(uriref):
+				return None
+			return match(uriref)
+		return guarded_match
+
+
+input_guard = None
+"The InputGuard used by `match` and the batch functions, if set. "
+
+
+### Batch matching
+
+def _reject(uriref, errors, rejects):
+	"Handle a malformed reference for the batch functions. "
+	if errors == 'strict':
+		raise MalformedURLExpection("Unexpected format: %r" % uriref)
+	if rejects is not None:
+		rejects.append(uriref)
+	return errors == 'ignore'
+
+def _peek(urirefs):
+	"""
+	Return True if the first of `urirefs` is bytes-like (ie. not a string),
+	and an iterator over all `urirefs`.
+	"""
+
+	urirefs = iter(urirefs)
+	for first in urirefs:
+		return not isinstance(first, str), itertools.chain((first,), urirefs)
+	return False, urirefs
+
+def _field_matcher(fields, validate, engine, guard, grammar, binary=False):
+	"""
+	Return the field names, the group index (or name) of each, the match
+	function and the type of match object for the batch functions.
+	"""
+
+	if isinstance(fields, str):
+		fields = (fields,)
+	if binary and engine not in (None, 'regex'):
+		raise TypeError("Engine %r cannot match bytes-like references" % engine)
+	if not binary and (engine or default_engine) == 'scanner':
+		fields = fields or parts
+		unknown = set(fields) - set(parts)
+		if unknown:
+			raise ValueError("Unknown URI part(s) %s" % ', '.join(sorted(unknown)))
+		indices = tuple(fields)
+		regex_match = functools.partial(scanner.split,
+				grammar=grammar or default_grammar)
+		match_type = scanner.ScanMatch
+	else:
+		if fields is None:
+			regex = _lazy(_prefix(grammar)+'URI_reference'+('_bytes' if binary else ''))
+			fields = parts
+		else:
+			regex = compile_for(fields, validate, grammar, binary)
+		indices = tuple([ regex.groupindex[field] for field in fields ])
+		regex_match = regex.match
+		match_type = re.Match
+	if guard is None:
+		guard = input_guard
+	if guard:
+		regex_match = guard.guarded(regex_match)
+	return tuple(fields), indices, regex_match, match_type
+
+def match_many(urirefs, errors='strict', rejects=None, engine=None,
+		guard=None, grammar=None):
+	"""
+	Match every string from iterable `urirefs`, yields the match objects.
 
-	Returns the match object or None.
+	Malformed references raise MalformedURLExpection if `errors` is 'strict',
+	are dropped with 'skip', or yield None with 'ignore'. Unless errors is
+	strict, malformed references are appended to the `rejects` list if given.
+	See `match` for `engine`, `guard` and `grammar`, references rejected by
+	the guard are handled as malformed.
+
+	If the first reference is bytes-like, all are matched with the bytes
+	regex (see `match`).
 	"""
 
-	if scheme.match(uriref):
-		return absoluteURI.match(uriref)
+	if errors not in ('strict', 'skip', 'ignore'):
+		raise ValueError("Unknown errors value %r" % errors)
+	binary, urirefs = _peek(urirefs)
+	if binary:
+		if engine not in (None, 'regex'):
+			raise TypeError("Engine %r cannot match bytes-like references" % engine)
+		regex_match = _lazy(_prefix(grammar)+'URI_reference_bytes').match
+	elif (engine or default_engine) == 'regex':
+		regex_match = _lazy(_prefix(grammar)+'URI_reference').match
 	else:
-		return relativeURI.match(uriref)
+		regex_match = functools.partial(engines[engine or default_engine],
+				grammar=grammar or default_grammar)
+	if guard is None:
+		guard = input_guard
+	if guard:
+		regex_match = guard.guarded(regex_match)
+	for uriref in urirefs:
+		m = regex_match(uriref)
+		if m is None and not _reject(uriref, errors, rejects):
+			continue
+		yield m
+
+
+def parse_many(urirefs, fields=None, as_dict=False, errors='strict',
+		rejects=None, validate=True, engine=None, guard=None, grammar=None):
+	"""
+	Parse every string from iterable `urirefs`, yields a tuple with the values
+	of the `fields` (group names, default all) per reference, or a single value
+	if one field is given (like `re.Match.group`). With `as_dict` a dictionary
+	of field names and values is yielded instead.
+
+	See `match_many` for `errors` and `rejects`, with 'ignore' None is yielded
+	for malformed references. The regex is given by `compile_for`, without
+	`validate` references may only be matched up to the requested fields.
+
+	With the 'scanner' `engine` references are split but never validated. See
+	`match` for `guard` and `grammar`. If the first reference is bytes-like,
+	all are matched with a bytes regex and the values are bytes.
+	"""
+
+	if errors not in ('strict', 'skip', 'ignore'):
+		raise ValueError("Unknown errors value %r" % errors)
+	groupdict = as_dict and fields is None
+	binary, urirefs = _peek(urirefs)
+	fields, indices, regex_match, match_type = _field_matcher(fields, validate,
+			engine, guard, grammar, binary)
+	group = match_type.group
+
+	for uriref in urirefs:
+		m = regex_match(uriref)
+		if m is None:
+			if _reject(uriref, errors, rejects):
+				yield None
+		elif not as_dict:
+			yield group(m, *indices)
+		elif groupdict:
+			yield m.groupdict()
+		elif len(indices) == 1:
+			yield { fields[0]: group(m, indices[0]) }
+		else:
+			yield dict(zip(fields, group(m, *indices)))
+
+
+def parse_columns(urirefs, fields=None, as_numpy=None, validate=True,
+		engine=None, guard=None, grammar=None):
+	"""
+	Parse every string from iterable `urirefs` into columns of offsets,
+	instead of a tuple or dictionary of strings per reference.
+
+	Returns a NumPy structured array with a record per reference, or a
+	dictionary of arrays without NumPy. Either way `columns['valid']` is true
+	for valid references, and `columns[name]['start']` and
+	`columns[name]['end']` are int32 offsets of each of the `fields` (default
+	all `parts`), -1 if the part did not match or the reference is malformed.
+	See `materialize` to get the strings of one part.
+
+	NumPy is used if it can be imported, unless `as_numpy` is False. See
+	`parse_many` for the other arguments, and for bytes-like references.
+	"""
+
+	numpy = None
+	if as_numpy is not False:
+		try:
+			import numpy
+		except ImportError:
+			if as_numpy:
+				raise
+
+	binary, urirefs = _peek(urirefs)
+	fields, indices, regex_match, match_type = _field_matcher(fields, validate,
+			engine, guard, grammar, binary)
+	unmatched = (0,) + (-1,) * (len(fields) * 2)
+	records = array.array('i')
+	extend = records.extend
+	for uriref in urirefs:
+		m = regex_match(uriref)
+		if m is None:
+			extend(unmatched)
+		else:
+			extend(sum(map(m.span, indices), (1,)))
+
+	# Records are the valid flag and the offsets for each field, as int32
+	width = len(fields) * 2 + 1
+	if numpy is not None:
+		offsets = numpy.dtype([ ('start', 'i4'), ('end', 'i4') ])
+		dtype = numpy.dtype(dict(names=('valid',) + fields,
+			formats=['?'] + [ offsets ] * len(fields),
+			offsets=[ 0 if sys.byteorder == 'little' else 3 ]
+				+ [ 4 + i * 8 for i in range(len(fields)) ],
+			itemsize=width * 4))
+		return numpy.frombuffer(records, dtype)
+	columns = { 'valid': array.array('b', records[0::width]) }
+	for i, field in enumerate(fields):
+		columns[field] = {
+			'start': records[i * 2 + 1::width],
+			'end': records[i * 2 + 2::width]
+		}
+	return columns
+
+def materialize(urirefs, columns, name):
+	"""
+	Return a list with the string for part `name` of every reference in
+	`urirefs`, or None, sliced with the offsets from `parse_columns`.
+	"""
+
+	starts, ends = columns[name]['start'].tolist(), columns[name]['end'].tolist()
+	return [ uriref[start:end] if start >= 0 else None
+			for uriref, start, end in zip(urirefs, starts, ends) ]
+
+
+### Normalization
+
+default_ports = {
+	'ftp': 21,
+	'http': 80,
+	'https': 443,
+	'ws': 80,
+	'wss': 443,
+}
+"""
+The port that is dropped by `normalize` for each scheme. For these schemes
+an empty path after the authority is normalized to '/'.
+"""
+
+_escape = re.compile(r"%[0-9A-Fa-f]{2}")
+_unreserved = frozenset(string.ascii_letters + string.digits + '-._~')
+
+def _unescape(m):
+	"Decode an escaped RFC 3986 unreserved character, or upper case the escape. "
+	escape = m.group().upper()
+	c = chr(int(escape[1:], 16))
+	if c in _unreserved:
+		return c
+	return escape
+
+def _normalize_escapes(part):
+	if part and '%' in part:
+		return _escape.sub(_unescape, part)
+	return part
+
+def _unescape_host(m):
+	"Decode an escaped unreserved character in lower case, or upper case the escape. "
+	c = _unescape(m)
+	if len(c) == 1:
+		return c.lower()
+	return c
+
+def _normalize_host(host):
+	"Return `host` in lower case with decoded escapes, other escapes in upper case. "
+	host = host.lower()
+	if '%' in host:
+		return _escape.sub(_unescape_host, host)
+	return host
+
+def remove_dot_segments(path):
+	"""
+	Return `path` without '.' and '..' segments, per RFC 3986 section 5.2.4.
+	A '..' segment removes the preceding segment, and is dropped at the start.
+	Leading '.' and '..' segments of a relative path are dropped, and once its
+	first segment is removed the result starts with '/' (ie. 'a/../b' gives
+	'/b'), as with the loop over the input buffer in the RFC.
+	"""
+
+	if '/.' not in path and path[:1] != '.':
+		return path
+	segments = path.split('/')
+	last = len(segments) - 1
+	i = 0
+	# rules A and D: dot segments at the start of a relative path
+	while segments[i] in ('.', '..'):
+		if i == last:
+			return ''
+		i += 1
+	# the output buffer as list of segments, only the first without '/'
+	output = [ segments[i] ]
+	for i in range(i + 1, last + 1):
+		segment = segments[i]
+		if segment == '..':
+			if output:
+				output.pop()
+		elif segment != '.':
+			output.append('/' + segment)
+			continue
+		if i == last:
+			output.append('/')
+	return ''.join(output)
+
+def _assemble(group):
+	"""
+	Return the normalized reference from the parts given by `group(name)`, in
+	one pass over the parts.
+	"""
+
+	out = []
+	scheme = group('scheme')
+	if scheme is not None:
+		scheme = scheme.lower()
+		out.extend((scheme, ':'))
+	authority = group('authority')
+	if authority is not None:
+		out.append('//')
+		host = group('host')
+		if host is None:
+			out.append(_normalize_escapes(authority))
+		else:
+			userinfo = group('userinfo')
+			if userinfo is not None:
+				out.extend((_normalize_escapes(userinfo), '@'))
+			out.append(_normalize_host(host))
+			port = group('port')
+			if port and int(port) != default_ports.get(scheme):
+				out.extend((':', port))
+		path = group('net_path')
+		if not path and scheme in default_ports:
+			out.append('/')
+		elif path:
+			out.append(remove_dot_segments(_normalize_escapes(path)))
+	else:
+		path = group('abs_path')
+		if path is not None:
+			out.append(remove_dot_segments(_normalize_escapes(path)))
+		else:
+			path = group('rel_path') or group('opaque_part')
+			if path:
+				out.append(_normalize_escapes(path))
+	query = group('query')
+	if query is not None:
+		out.extend(('?', _normalize_escapes(query)))
+	fragment = group('fragment')
+	if fragment is not None:
+		out.extend(('#', _normalize_escapes(fragment)))
+	return ''.join(out)
+
+def _normalize(uriref, grammar):
+	m = match(uriref, grammar=grammar)
+	if m is None:
+		raise MalformedURLExpection("Unexpected format: %r" % uriref)
+	return _assemble(m.group)
+
+def normalize(uriref, grammar='rfc3986'):
+	"""
+	Return the normal form of reference string `uriref` per RFC 3986 section
+	6.2.2 and 6.2.3: the scheme and host in lower case, escapes of unreserved
+	characters decoded and other escapes in upper case, no dot segments in
+	absolute paths, no empty or default port (see `default_ports`), and '/'
+	for an empty path after the authority. Relative paths keep their dot
+	segments, which matter when resolved.
+
+	The default grammar is 'rfc3986', as 'rfc2396' reads '//host' without a
+	path as abs_path. Malformed references raise MalformedURLExpection.
+	Results are looked up in `normalize_cache` first, if enabled.
+	"""
+
+	if normalize_cache is not None:
+		return normalize_cache(uriref, grammar)
+	return _normalize(uriref, grammar)
+
+def normalize_many(urirefs, errors='strict', rejects=None, grammar='rfc3986'):
+	"""
+	Normalize every string from iterable `urirefs`, yields the normal forms.
+	See `match_many` for `errors` and `rejects`, and `normalize`.
+	"""
+
+	if errors not in ('strict', 'skip', 'ignore'):
+		raise ValueError("Unknown errors value %r" % errors)
+	if normalize_cache is None:
+		for m in match_many(urirefs, errors, rejects, grammar=grammar):
+			yield m and _assemble(m.group)
+		return
+	cached = normalize_cache
+	for uriref in urirefs:
+		try:
+			yield cached(uriref, grammar)
+		except MalformedURLExpection:
+			if _reject(uriref, errors, rejects):
+				yield None
+
+
+normalize_cache = None
+"""
+The bounded memo of `normalize` results by reference and grammar, if
+enabled. This is a functools.lru_cache wrapper, with `cache_info` and
+`cache_clear`. Malformed references are not cached.
+"""
+
+def enable_normalize_cache(maxsize=65536):
+	"Set and return a new `normalize_cache` with `maxsize` entries. "
+	global normalize_cache
+	normalize_cache = functools.lru_cache(maxsize)(_normalize)
+	return normalize_cache
+
+def disable_normalize_cache():
+	"Stop caching `normalize` results. "
+	global normalize_cache
+	normalize_cache = None
+
+
+### Reference resolution
+
+_resolve_parts = ( 'scheme', 'authority', 'net_path', 'abs_path', 'rel_path',
+	'opaque_part', 'query', 'fragment' )
+
+class Resolver(object):
+
+	"""
+	Resolves references against the absolute URI `base`, following the strict
+	algorithm of RFC 3986 section 5.2 (see `remove_dot_segments` for bases with
+	a rootless path, ie. 'urn:x:y'). The base is parsed, and its path split for
+	merging, once for all references.
+
+	References and targets are matched like `match` with the regex engine and
+	the `grammar` of the resolver, so `input_guard` and `parse_cache` apply
+	to single references and to the batch methods alike.
+	"""
+
+	def __init__(self, base, grammar='rfc3986'):
+		self.grammar = grammar
+		self.regex = _lazy(_prefix(grammar)+'URI_reference')
+		self._indices = tuple([ self.regex.groupindex[name] for name in _resolve_parts ])
+		m = self.regex.match(base)
+		if m is None or m.group('scheme') is None:
+			raise MalformedURLExpection("Base is not an absolute URI: %r" % base)
+		self.base = base
+		scheme, authority, net_path, abs_path, rel_path, opaque_part, query, \
+				fragment = m.group(*self._indices)
+		self.scheme = scheme
+		self.authority = authority
+		self.path = net_path or abs_path or rel_path or opaque_part or ''
+		self.query = query
+		self._origin = scheme + ':'
+		if authority is not None:
+			self._origin += '//' + authority
+		"The scheme and authority of the base, as prefix for targets. "
+		if authority is not None and not self.path:
+			self._merge = '/'
+		else:
+			self._merge = self.path[:self.path.rfind('/') + 1]
+		"The base path up to the last '/', to merge relative paths with. "
+		self._dirs = self._merge.split('/')[:-1]
+		"The segments of the merge path, to make relative paths from. "
+
+	def resolve(self, ref):
+		"Return the target URI for reference string `ref`. "
+		m = self._matcher()(ref)
+		if m is None:
+			raise MalformedURLExpection("Unexpected format: %r" % ref)
+		return self._target(m.group(*self._indices))
+
+	def resolve_many(self, refs, errors='strict', rejects=None):
+		"""
+		Resolve every string from iterable `refs`, yields the target URIs. See
+		`match_many` for `errors` and `rejects`.
+		"""
+		if errors not in ('strict', 'skip', 'ignore'):
+			raise ValueError("Unknown errors value %r" % errors)
+		target, indices, regex_match = self._target, self._indices, self._matcher()
+		for ref in refs:
+			m = regex_match(ref)
+			if m is None and not _reject(ref, errors, rejects):
+				continue
+			yield m and target(m.group(*indices))
+
+	def _matcher(self):
+		"Return a function to match references with, like `match`. "
+		regex_match = self.regex.match
+		if parse_cache is not None:
+			cache_match, prefix = parse_cache.match, _prefix(self.grammar)
+			regex_match = lambda ref: cache_match(ref, prefix)
+		if input_guard:
+			regex_match = input_guard.guarded(regex_match)
+		return regex_match
+
+	def _target(self, groups):
+		scheme, authority, net_path, abs_path, rel_path, opaque_part, query, \
+				fragment = groups
+		if scheme is not None:
+			out = [ scheme, ':' ]
+			if authority is not None:
+				out.extend(('//', authority))
+			out.append(remove_dot_segments(net_path or abs_path or opaque_part or ''))
+		elif authority is not None:
+			out = [ self.scheme, '://', authority, remove_dot_segments(net_path) ]
+		elif abs_path is not None:
+			out = [ self._origin, remove_dot_segments(abs_path) ]
+		elif rel_path:
+			out = [ self._origin, remove_dot_segments(self._merge + rel_path) ]
+		else:
+			out = [ self._origin, self.path ]
+			if query is None:
+				query = self.query
+		if query is not None:
+			out.extend(('?', query))
+		if fragment is not None:
+			out.extend(('#', fragment))
+		return ''.join(out)
+
+	def make_relative(self, target):
+		"""
+		Return the shortest reference that resolves to the absolute URI
+		`target`. Candidates are a same-document reference, a relative path, an
+		absolute path and a network-path reference, and each is resolved to
+		check it before it is returned. If none gives the target (ie. for
+		another scheme, or a path with dot segments) the target is returned.
+		"""
+
+		m = self._matcher()(target)
+		if m is None or m.group('scheme') is None:
+			raise MalformedURLExpection("Target is not an absolute URI: %r" % target)
+		return self._relative(target, m.group(*self._indices))
+
+	def make_relative_many(self, targets, errors='strict', rejects=None):
+		"""
+		Make every absolute URI from iterable `targets` relative, yields the
+		references. See `match_many` for `errors` and `rejects`, targets that
+		are relative references are handled as malformed.
+		"""
+
+		relative, indices, regex_match = self._relative, self._indices, self._matcher()
+		for target in targets:
+			m = regex_match(target)
+			if m is None or m.group('scheme') is None:
+				if _reject(target, errors, rejects):
+					yield None
+				continue
+			yield relative(target, m.group(*indices))
+
+	def _relative(self, target, groups):
+		scheme, authority, net_path, abs_path, rel_path, opaque_part, query, \
+				fragment = groups
+		if scheme != self.scheme:
+			return target
+		suffix = ''
+		if query is not None:
+			suffix = '?' + query
+		if fragment is not None:
+			suffix += '#' + fragment
+		path = net_path or abs_path or rel_path or opaque_part or ''
+		candidates = []
+		if authority is not None:
+			candidates.append('//' + authority + path + suffix)
+		if authority == self.authority:
+			if path == self.path:
+				if query == self.query:
+					candidates.append('' if fragment is None else '#' + fragment)
+				elif query is not None:
+					candidates.append(suffix)
+			if path[:1] == '/' and path[:2] != '//':
+				candidates.append(path + suffix)
+			candidates.append(self._relative_path(path) + suffix)
+		candidates.sort(key=len)
+		for ref in candidates:
+			if len(ref) >= len(target):
+				break
+			if self.resolve(ref) == target:
+				return ref
+		return target
+
+	def _relative_path(self, path):
+		"Return a relative path from the merge path of the base to `path`. "
+		segments = path.split('/')
+		dirs = self._dirs
+		common, last = 0, min(len(dirs), len(segments) - 1)
+		while common < last and dirs[common] == segments[common]:
+			common += 1
+		up = len(dirs) - common
+		rel = '/'.join(segments[common:])
+		if not rel:
+			return '../' * (up - 1) + '..' if up else '.'
+		if not up:
+			first = segments[common]
+			if not first or ':' in first:
+				return './' + rel
+		return '../' * up + rel
+
+def make_relative(base, target, grammar='rfc3986'):
+	"""
+	Return the shortest reference to the absolute URI `target` relative to the
+	absolute URI `base`, see `Resolver.make_relative`. Use a Resolver to make
+	many targets relative to one base.
+	"""
+
+	return Resolver(base, grammar).make_relative(target)
+
+def resolve(base, ref, grammar='rfc3986'):
+	"""
+	Return the target URI of reference `ref` resolved against the absolute
+	URI `base`, see `Resolver`. Use a Resolver to resolve many references
+	against one base.
+	"""
+
+	return Resolver(base, grammar).resolve(ref)
 
 
 def urlparse(uriref, md=None):
@@ -448,28 +1631,36 @@ def onsamedomain(url1, url2):
 
 	"""Examine the URLs and return true if they are on the same
 	domain (but perhaps in a different subdomain).
+
+	The domain is the registered domain from the `uriref.publicsuffix` list,
+	loaded on first use from `publicsuffix.default_path()` unless set with
+	`publicsuffix.load`. Without a list file the domain is the last two labels
+	of the host, as before the list was used, so 'a.co.uk' and 'b.co.uk' are
+	on the same domain. Use `uriref.publicsuffix.same_site` to compare many
+	URLs.
+
+	Ports are ignored, and hosts that are a public suffix or IP address are
+	compared as a whole, so 'http://localhost/' and 'http://localhost:8080/'
+	are on the same domain. URLs without a host are on no domain.
 	"""
 
-	url1parts = urllib.parse.urlparse(url1)
-	url2parts = urllib.parse.urlparse(url2)
-	host1, host2 = url1parts[1], url2parts[1]
-	host1, host2 = host1.split('.'), host2.split('.')
+	from . import publicsuffix
+	for same in publicsuffix.same_site([ (url1, url2) ]):
+		return same
 
-	# TLD
-	if len(host1) > 0 and len(host2) > 0:
-		part1, part2 = host1.pop(), host2.pop()
-		if not part1 == part2:
-			return False
-	# domain
-	if len(host1) > 0 and len(host2) > 0:
-		part1, part2 = host1.pop(), host2.pop()
-		if not part1 == part2:
-			return False
-		else:
-			return True
-	return False
 
 
+parts = ( 'scheme', 'authority', 'userinfo', 'host', 'port', 'net_path',
+	'abs_path', 'rel_path', 'opaque_part', 'query', 'fragment' )
+"The named groups of `URI_reference`, in order of appearance. "
+
+_part_offsets = dict([ (name, i * 2) for i, name in enumerate(parts) ])
+
+@functools.lru_cache()
+def _part_indices(regex):
+	"Return the group number in `regex` for each of the `parts`. "
+	return tuple([ regex.groupindex[name] for name in parts ])
+
 
 class URIRef(str):
 
@@ -482,35 +1673,62 @@ class URIRef(str):
 
 	The uriref project comes with a command line tool 'uriref-cli' that
 	pretty-prints a table of all parts given a uriref instance as argument.
+
+	Instances only keep the offsets of the parts (see `spans`), part strings
+	are sliced from the reference when accessed.
 	"""
 
-	def __new__(type, *args, **kwds):
-		return str.__new__(type, *args)
+	__slots__ = ('spans', 'opaque_targets')
+
+	def __new__(type, uri, *args, **kwds):
+		return str.__new__(type, uri)
 
-	def __init__(self, uri, opaque_targets=[]):
-		"Construct instance with match object and parts dictionary."
+	def __init__(self, uri, opaque_targets=[], grammar=None):
+		"Construct instance with the (start, end) offsets of each part."
 		"`opaque_targets` indicates partnames which may 'default' to opaque_part."
 
-		str.__init__(uri)
-		self.__match__ = match(uri)
-		if not self.__match__:
+		m = match(uri, grammar=grammar)
+		if not m:
 			raise MalformedURLExpection("Unexpected format: %r" % uri)
 
-		self.__groups__ = self.__match__.groupdict()
+		if isinstance(m, scanner.ScanMatch):
+			self.spans = array.array('i', m.spans)
+		else:
+			self.spans = array.array('i', sum(map(m.span, _part_indices(m.re)), ()))
+		"Start and end offset for each of the `parts`, -1 if not matched. "
 
 		self.opaque_targets = opaque_targets
 		"The partnames that if not set get the value of opaque_part/"
 
+	def part(self, name):
+		"Return the string for match group `name`, or None. "
+		i = _part_offsets[name]
+		start = self.spans[i]
+		if start < 0:
+			return None
+		return str.__getitem__(self, slice(start, self.spans[i+1]))
+
+	def __reduce__(self):
+		"Pickle and copy the reference string and offsets, without matching again. "
+		return (copyreg.__newobj__, (type(self), str.__str__(self)),
+			(self.spans, self.opaque_targets))
+
+	def __setstate__(self, state):
+		self.spans, self.opaque_targets = state
+
 	def __getattr__(self, name):
 		"Generic getter access to match groups. "
 		part = None
-		if name in self.__groups__:
-			part = self.__groups__[name]
+		if name in URIRef.__slots__:
+			# not initialized, ie. while unpickling
+			raise AttributeError(name)
+		elif name in _part_offsets:
+			part = self.part(name)
 		elif name in self.opaque_targets:
-			part = self.__groups__['opaque_part']
+			part = self.part('opaque_part')
 		elif name == 'path':
 			part = self.path
-		elif name in grouped_expressions:
+		elif name in _lazy('grouped_expressions'):
 			return None
 		else:
 			raise AttributeError(name)
@@ -519,10 +1737,9 @@ class URIRef(str):
 	# Special 'groups'
 	@property
 	def port(self, *value):
-		if 'port' not in self.__groups__ or not self.__groups__['port']:
-			port = None
-		else:
-			port = int(self.__groups__['port'])
+		port = self.part('port')
+		if port:
+			port = int(port)
 		if not port:
 			if self.scheme in ('http', 'https'):
 				return 80
@@ -534,7 +1751,7 @@ class URIRef(str):
 
 	@property
 	def query(self, *value):
-		return self.__groups__['query']
+		return self.part('query')
 
 	@property
 	def query_args(self):
@@ -564,10 +1781,10 @@ class URIRef(str):
 		"""
 		Return //<host><net_path> (no userinfo or port)
 		"""
-		if 'net_path' in self.__groups__:
+		if self.part('net_path') is not None:
 			return "//%s%s" % (
-					self.__groups__['host'],
-					self.__groups__['net_path']
+					self.part('host'),
+					self.part('net_path')
 				)
 
 	@property
@@ -576,8 +1793,9 @@ class URIRef(str):
 		Return either abs_path, rel_path or net_path group.
 		"""
 		for attr in 'abs_path', 'rel_path', 'net_path':
-			if attr in self.__groups__ and self.__groups__[attr]:
-				return self.__groups__[attr]
+			part = self.part(attr)
+			if part:
+				return part
 
 	#
 	def generate_signature(self):
@@ -607,6 +1825,10 @@ class URIRef(str):
 
 		return tuple(sig)
 
+	def normalized(self, grammar='rfc3986'):
+		"Return a new URIRef for the normal form of this reference, see `normalize`. "
+		return URIRef(normalize(self, grammar), self.opaque_targets, grammar)
+
 	def __repr__(self):
 		return "URIRef(%s)" % self
 
@@ -615,3 +1837,65 @@ class URIRef(str):
 
 	def __str__(self):
 		return "".join(self.generate_signature())
+
+
+class URIRefView(object):
+
+	"""
+	The parts of a reference in a bytes-like object (bytes, bytearray,
+	memoryview or mmap), without decoding it. Like `URIRef` only the offsets
+	of the parts are kept, which are sliced from `buffer` when accessed: as
+	bytes from bytes and mmap objects, or as memoryview (without copying)
+	from a memoryview.
+	"""
+
+	__slots__ = ('buffer', 'spans')
+
+	def __init__(self, buffer, grammar=None):
+		"Match `buffer` and keep the (start, end) offsets of each part."
+
+		m = match(buffer, grammar=grammar)
+		if not m:
+			raise MalformedURLExpection("Unexpected format: %r" % bytes(buffer))
+		self.buffer = buffer
+		self.spans = array.array('i', sum(map(m.span, _part_indices(m.re)), ()))
+		"Start and end offset for each of the `parts`, -1 if not matched. "
+
+	def span(self, name):
+		"Return the (start, end) offset of match group `name`, or None. "
+		i = _part_offsets[name]
+		start = self.spans[i]
+		if start < 0:
+			return None
+		return start, self.spans[i+1]
+
+	def part(self, name):
+		"Return the slice of `buffer` for match group `name`, or None. "
+		i = _part_offsets[name]
+		start = self.spans[i]
+		if start < 0:
+			return None
+		return self.buffer[start:self.spans[i+1]]
+
+	def __getattr__(self, name):
+		"Generic getter access to match groups, and path. "
+		if name in URIRefView.__slots__:
+			raise AttributeError(name)
+		elif name in _part_offsets:
+			return self.part(name)
+		elif name == 'path':
+			for attr in 'abs_path', 'rel_path', 'net_path':
+				part = self.part(attr)
+				if part:
+					return part
+			return None
+		raise AttributeError(name)
+
+	def __len__(self):
+		return len(self.buffer)
+
+	def __bytes__(self):
+		return bytes(self.buffer)
+
+	def __repr__(self):
+		return "URIRefView(%r)" % bytes(self.buffer)
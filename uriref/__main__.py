@@ -1,4 +1,5 @@
 from . import *
+from . import absoluteURI, expressions
 
 
 ### Testing
@@ -0,0 +1,126 @@
+"""
+Parse references from asyncio streams, without blocking the event loop.
+
+Lines from an async iterable or an `asyncio.StreamReader` are collected in
+batches, that are parsed with `uriref.parse_many` in an executor. The event
+loop only reads lines and hands over results.
+
+With the default thread pool executor parsing still holds the GIL, and the
+loop gets a turn every `sys.getswitchinterval()`. Pass a
+`concurrent.futures.ProcessPoolExecutor` to parse outside of this process.
+"""
+import asyncio
+import collections
+import time
+
+import uriref
+
+
+def parse_batch(lines, kwds):
+	"Parse a batch of lines with `uriref.parse_many`, returns the results and seconds. "
+	started = time.perf_counter()
+	results = list(uriref.parse_many(lines, **kwds))
+	return results, time.perf_counter() - started
+
+
+def _line(item):
+	"Return `item` as string without line end, bytes are decoded as Latin-1. "
+	if isinstance(item, (bytes, bytearray)):
+		item = item.decode('latin-1')
+	return item.rstrip('\r\n')
+
+
+async def parse_stream(source, batch_size=1024, executor=None, max_pending=4,
+		flush_seconds=0.1, stats=None, **kwds):
+	"""
+	Async generator that yields the `uriref.parse_many` result for each line
+	from `source`, in order. Other keywords are passed to parse_many, by
+	default `errors` is 'ignore' so that None is yielded for malformed lines.
+
+	Lines are read in a task and parsed in batches of `batch_size` lines in
+	`executor` (default the loop's thread pool). A partial batch is submitted
+	`flush_seconds` after its first line was read, or with None only once it
+	is full or `source` ends. The results of a batch are yielded as soon as it
+	and the batches before it are parsed. No more lines are read while
+	`max_pending` batches are waiting to be parsed or consumed.
+
+	If a `stats` list is given, a dictionary is appended for each batch with
+	the number of lines, the seconds spent parsing in the executor, the
+	seconds spent on the loop decoding and collecting the lines and submitting
+	the batch (`read_seconds`, not including waits for the source), and the
+	latency from submitting the batch to its results. The lag of other tasks
+	on the loop is not measured, a task that sleeps and times how late it
+	wakes up measures that.
+	"""
+
+	kwds.setdefault('errors', 'ignore')
+	loop = asyncio.get_running_loop()
+	pending = collections.deque()
+	ready, room = asyncio.Event(), asyncio.Event()
+	batch, reading, timer = [], 0.0, None
+
+	def submit():
+		nonlocal batch, reading, timer
+		if timer is not None:
+			timer.cancel()
+		started = time.perf_counter()
+		future = loop.run_in_executor(executor, parse_batch, batch, kwds)
+		pending.append((future, len(batch), reading + time.perf_counter() - started,
+			started))
+		batch, reading, timer = [], 0.0, None
+		ready.set()
+
+	def flush():
+		nonlocal timer
+		timer = None
+		if batch and len(pending) < max_pending:
+			submit()
+
+	async def read():
+		nonlocal reading, timer
+		try:
+			async for item in source:
+				started = time.perf_counter()
+				batch.append(_line(item))
+				reading += time.perf_counter() - started
+				if len(batch) >= batch_size:
+					submit()
+				elif len(batch) == 1 and flush_seconds is not None:
+					timer = loop.call_later(flush_seconds, flush)
+				while len(pending) >= max_pending:
+					room.clear()
+					await room.wait()
+			if batch:
+				submit()
+		finally:
+			ready.set()
+
+	async def collect():
+		future, lines, read, started = pending.popleft()
+		results, seconds = await future
+		if stats is not None:
+			stats.append(dict(lines=lines, parse_seconds=seconds,
+				read_seconds=read, latency=time.perf_counter() - started))
+		room.set()
+		if batch and timer is None and flush_seconds is not None:
+			submit()
+		return results
+
+	reader = asyncio.ensure_future(read())
+	try:
+		while True:
+			if pending:
+				for result in await collect():
+					yield result
+			elif reader.done():
+				reader.result()
+				break
+			else:
+				ready.clear()
+				await ready.wait()
+	finally:
+		reader.cancel()
+		if timer is not None:
+			timer.cancel()
+		for future, lines, read, started in pending:
+			future.cancel()
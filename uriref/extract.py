@@ -0,0 +1,239 @@
+"""
+Find absolute URIs in free text.
+
+The regexes of `uriref` are anchored, and match a whole string as reference.
+To find references in text, a cheap candidate regex finds runs of characters
+that may occur in a URI, starting with a scheme that is not part of a longer
+word. Each run is then matched with the `embeddedURI` regex of the grammar,
+which is the absolute URI with optional fragment without anchors, within the
+run (using `pos` and `endpos`). Trailing punctuation that is more likely part
+of the text, and unbalanced closing parentheses, are trimmed.
+
+If the scheme of a run is not allowed, or the run does not match, the rest of
+the run after its first ':' is searched again. In 'Note:http://example.org/'
+the word 'Note:' is text, and a scheme that is directly followed by a URI with
+authority is taken as text too (except for `nesting_schemes`).
+
+Text can be str or a bytes-like object, including mmap. For bytes the bytes
+regexes are used, and the URI and groups are bytes. `StreamExtractor` finds
+the same URIs in text that is read in chunks.
+"""
+import mmap
+import re
+
+import uriref
+
+
+uri_chars = r"!#-;=?-\[\]_a-z~"
+"""
+The printable ASCII characters except whitespace and ``"<>\\^`{|}``, which
+cannot occur in a URI in any grammar. Candidate runs consist of these.
+"""
+
+scheme_boundary = r"(?<![A-Za-z0-9+.\-])"
+"A scheme does not start after a character that could be part of one. "
+
+trailing = ".,;:!?'\""
+"Characters that are trimmed from the end of a URI found in text. "
+
+nesting_schemes = frozenset(['blob', 'feed', 'jar', 'view-source'])
+"""
+Schemes of URIs that embed another URI, ie. 'jar:http://host/a.jar!/x'. Other
+schemes followed by a URI with authority are taken as a word in the text.
+"""
+
+def _expand(char_class):
+	"Return the characters of character class `char_class`, ie. `uri_chars`. "
+	regex = re.compile("[%s]" % char_class)
+	return ''.join([ chr(c) for c in range(128) if regex.match(chr(c)) ])
+
+_uri_chars = _expand(uri_chars)
+_uri_bytes = _uri_chars.encode('ascii')
+
+
+class Extractor(object):
+
+	"""
+	Finds absolute URIs in text with the grammar `grammar` (default
+	`uriref.default_grammar`). If `schemes` are given, only URIs with one of
+	these schemes are found, which cuts false positives such as 'note:'.
+	"""
+
+	def __init__(self, schemes=None, grammar=None):
+		self.schemes = schemes and frozenset([ s.lower() for s in schemes ])
+		"The allowed schemes in lower case, or None. "
+		self.prefix = uriref._prefix(grammar)
+		scheme = r"%s([A-Za-z][A-Za-z0-9+.\-]*+):" % scheme_boundary
+		pattern = r"%s[%s]++" % (scheme, uri_chars)
+		nested = r"[A-Za-z][A-Za-z0-9+.\-]*+://"
+		if not uriref.possessive:
+			scheme, pattern, nested = map(uriref.greedy, (scheme, pattern, nested))
+		self.candidates = re.compile(pattern)
+		"Regex for the runs of text that may contain a URI. "
+		self.candidates_bytes = re.compile(pattern.encode('ascii'))
+		self.scheme = re.compile(scheme)
+		"Regex for the next scheme within a run. "
+		self.scheme_bytes = re.compile(scheme.encode('ascii'))
+		self.nested = re.compile(nested)
+		self.nested_bytes = re.compile(nested.encode('ascii'))
+
+	def finditer(self, text, pos=0, endpos=None):
+		"""
+		Yield (offset, uri, groups) for each URI in `text` between `pos` and
+		`endpos`, where groups is a dictionary with each of the `uriref.parts`
+		(like `groupdict` of a `uriref.match`).
+		"""
+
+		if endpos is None:
+			endpos = len(text)
+		schemes, nesting = self.schemes, nesting_schemes
+		if isinstance(text, str):
+			candidates, scheme, nested = self.candidates, self.scheme, self.nested
+			embedded = uriref._lazy(self.prefix+'embeddedURI')
+			chars, closing, opening = trailing, ')', '('
+		else:
+			candidates, scheme, nested = self.candidates_bytes, self.scheme_bytes, \
+				self.nested_bytes
+			embedded = uriref._lazy(self.prefix+'embeddedURI_bytes')
+			chars, closing, opening = trailing.encode('ascii'), b')', b'('
+			if schemes:
+				schemes = frozenset([ s.encode('ascii') for s in schemes ])
+			nesting = frozenset([ s.encode('ascii') for s in nesting ])
+		for candidate in candidates.finditer(text, pos, endpos):
+			end = candidate.end()
+			while candidate is not None:
+				start, colon = candidate.start(), candidate.end(1) + 1
+				name = candidate.group(1).lower()
+				m = None
+				if schemes:
+					if name in schemes:
+						m = embedded.match(text, start, end)
+				elif name in nesting or not nested.match(text, colon, end):
+					m = embedded.match(text, start, end)
+				if m is not None:
+					uri = m.group()
+					length = len(uri)
+					while length:
+						c = uri[length-1:length]
+						if c in chars or c == closing and \
+								uri.count(closing, 0, length) > uri.count(opening, 0, length):
+							length -= 1
+						else:
+							break
+					if length < len(uri):
+						m = embedded.fullmatch(text, start, start + length)
+						uri = uri[:length]
+				if m is not None:
+					groups = dict.fromkeys(uriref.parts)
+					groups.update(m.groupdict())
+					yield start, uri, groups
+					break
+				# not a URI here, ie. 'Note:', try the rest of the run
+				candidate = scheme.search(text, colon, end)
+
+
+_extractors = {}
+
+def extract(text, schemes=None, grammar=None):
+	"""
+	Yield (offset, uri, groups) for each absolute URI in `text`, see
+	`Extractor`. Extractors are created once for each set of schemes and
+	grammar.
+	"""
+
+	key = schemes and tuple(schemes), grammar
+	if key not in _extractors:
+		_extractors[key] = Extractor(schemes, grammar)
+	return _extractors[key].finditer(text)
+
+def extract_file(path, schemes=None, grammar=None):
+	"""
+	Yield (offset, uri, groups) for each absolute URI in file `path`, which is
+	memory mapped and matched as bytes.
+	"""
+
+	with open(path, 'rb') as f:
+		if not f.seek(0, 2):
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			for found in extract(data, schemes, grammar):
+				yield found
+
+
+class StreamExtractor(object):
+
+	"""
+	Finds absolute URIs in a stream of text, fed in chunks of any size (see
+	`Extractor` for `schemes` and `grammar`). `feed` and `close` return the
+	URIs as (offset, uri, groups), with the offset in the stream.
+
+	A URI cannot contain a character outside `uri_chars`, so all text up to
+	the last such character in a chunk is searched, and only the run of URI
+	characters after it is kept until the next chunk. The results are the
+	same as for the whole text at once, except that runs longer than
+	`max_tail` characters (which can only be malformed or huge references)
+	are dropped to bound memory.
+
+	Chunks are str or bytes, the same for the whole stream.
+	"""
+
+	def __init__(self, schemes=None, grammar=None, max_tail=1<<16):
+		self.extractor = Extractor(schemes, grammar)
+		self.max_tail = max_tail
+		self.offset = 0
+		"The stream offset of the carried over text. "
+		self._tail = []
+		self.pending = 0
+		"The length of the carried over text. "
+		self._skipping = False
+
+	def feed(self, chunk):
+		"""
+		Add text `chunk`, returns a list of the URIs found up to its last
+		non-URI character.
+		"""
+
+		chars = _uri_chars if isinstance(chunk, str) else _uri_bytes
+		head = chunk.rstrip(chars)
+		if not head:
+			self._hold(chunk)
+			return []
+		if self._skipping:
+			start = len(chunk) - len(chunk.lstrip(chars))
+			self.offset += start
+			self._skipping = False
+			segment = head[start:]
+		else:
+			self._tail.append(head)
+			segment = head[:0].join(self._tail)
+		found = self._search(segment)
+		self._tail, self.pending = [], 0
+		self._hold(chunk[len(head):])
+		return found
+
+	def close(self):
+		"Return a list of the URIs in the carried over text, and reset. "
+		found = []
+		if self._tail:
+			found = self._search(self._tail[0][:0].join(self._tail))
+		self._tail, self.pending, self.offset = [], 0, 0
+		self._skipping = False
+		return found
+
+	def _hold(self, text):
+		"Carry over `text`, or drop it if the run gets longer than `max_tail`. "
+		if self._skipping:
+			self.offset += len(text)
+			return
+		self._tail.append(text)
+		self.pending += len(text)
+		if self.pending > self.max_tail:
+			self.offset += self.pending
+			self._tail, self.pending = [], 0
+			self._skipping = True
+
+	def _search(self, segment):
+		offset = self.offset
+		self.offset += len(segment)
+		return [ (offset + start, uri, groups)
+				for start, uri, groups in self.extractor.finditer(segment) ]
@@ -0,0 +1,398 @@
+"""
+In-memory indexes of URIs.
+
+`URITrie` keys absolute URIs by scheme, the labels of the host in reverse
+order (so that subdomains share the node of their domain), the port, and the
+segments of the path. All URIs under a prefix such as
+'https://example.org/docs/' are then found without a scan of the whole
+index. The query and fragment are not part of the key, URIs that only differ
+in these share a node.
+
+`HostSuffixSet` matches hosts against many domain rules, such as allow or
+block lists, in a trie of host labels.
+"""
+import re
+import sys
+
+import uriref
+
+
+class _Node(object):
+
+	"""
+	A trie node, with the number of URIs in its subtree. Most nodes have one
+	child or URI, which are kept as tuple instead of in a dictionary.
+	"""
+
+	__slots__ = ('children', 'entries', 'count')
+
+	def __init__(self):
+		self.children = None
+		"The key and child node as tuple, a dictionary if there are more, or None. "
+		self.entries = None
+		"The URI and its value as tuple, a dictionary if there are more, or None. "
+		self.count = 0
+
+	def child(self, key):
+		"Return the child node for `key`, or None. "
+		children = self.children
+		if children.__class__ is tuple:
+			if children[0] == key:
+				return children[1]
+		elif children is not None:
+			return children.get(key)
+
+	def add(self, key):
+		"Return the child node for `key`, a new node if there is none. "
+		children = self.children
+		if children is None:
+			child = _Node()
+			self.children = (key, child)
+			return child
+		if children.__class__ is tuple:
+			if children[0] == key:
+				return children[1]
+			children = self.children = { children[0]: children[1] }
+		child = children.get(key)
+		if child is None:
+			child = children[key] = _Node()
+		return child
+
+	def discard(self, key):
+		"Remove the child node for `key`. "
+		children = self.children
+		if children.__class__ is tuple:
+			self.children = None
+		else:
+			del children[key]
+			if len(children) == 1:
+				self.children = next(iter(children.items()))
+
+	def items(self):
+		"Return a list of (key, child node) pairs. "
+		children = self.children
+		if children is None:
+			return []
+		if children.__class__ is tuple:
+			return [ children ]
+		return list(children.items())
+
+
+class URITrie(object):
+
+	"""
+	Maps absolute URIs to values, indexed by their key (see `key`). URIs are
+	parsed with the regex for `fields` of `grammar` (default 'rfc3986').
+
+	Scheme and host labels are lower case in the key, but URIs are stored and
+	looked up as given, normalize them first (see `uriref.normalize`) to
+	treat equivalent URIs as one.
+	"""
+
+	fields = ( 'scheme', 'host', 'port', 'net_path', 'abs_path', 'opaque_part' )
+
+	def __init__(self, grammar='rfc3986'):
+		self.grammar = grammar
+		self.regex = uriref.compile_for(self.fields, validate=True, grammar=grammar)
+		self._indices = tuple([ self.regex.groupindex[name] for name in self.fields ])
+		self.root = _Node()
+
+	def key(self, uri, subdomains=False):
+		"""
+		Return the key for `uri` as list: the scheme, the host labels from
+		right to left, ':' and the port, and the path segments. With
+		`subdomains` the key ends after the host labels.
+		"""
+
+		m = self.regex.match(uri)
+		if m is None or m.group('scheme') is None:
+			raise uriref.MalformedURLExpection("Not an absolute URI: %r" % uri)
+		scheme, host, port, net_path, abs_path, opaque_part = m.group(*self._indices)
+		key = [ scheme.lower() ]
+		if host is not None:
+			key.extend(reversed(host.lower().split('.')))
+		if subdomains:
+			return key
+		key.append(':' + (port or ''))
+		path = net_path or abs_path or opaque_part
+		if path:
+			segments = path.split('/')
+			if path[0] == '/':
+				del segments[0]
+			key.extend(segments)
+		return key
+
+	def insert(self, uri, value=None):
+		"Add `uri` with `value`, or replace its value. "
+		key = self.key(uri)
+		node = self.root
+		node.count += 1
+		for k in key:
+			children = node.children
+			if children.__class__ is dict and k in children:
+				node = children[k]
+			elif children.__class__ is tuple and children[0] == k:
+				node = children[1]
+			else:
+				node = node.add(k)
+			node.count += 1
+		entries = node.entries
+		if entries is None:
+			node.entries = (uri, value)
+			return
+		if entries.__class__ is tuple:
+			if entries[0] != uri:
+				node.entries = { entries[0]: entries[1], uri: value }
+				return
+			node.entries = (uri, value)
+		elif uri not in entries:
+			entries[uri] = value
+			return
+		else:
+			entries[uri] = value
+		# replaced a value, undo the counts
+		node = self.root
+		node.count -= 1
+		for k in key:
+			node = node.child(k)
+			node.count -= 1
+
+	def lookup(self, uri, default=None):
+		"Return the value of `uri`, or `default`. "
+		node = self._find(self.key(uri))
+		if node is None or node.entries is None:
+			return default
+		entries = node.entries
+		if entries.__class__ is tuple:
+			return entries[1] if entries[0] == uri else default
+		return entries.get(uri, default)
+
+	def remove(self, uri):
+		"Remove `uri`, raises KeyError if it is not in the trie. "
+		key = self.key(uri)
+		path = [ self.root ]
+		for k in key:
+			node = path[-1].child(k)
+			if node is None:
+				raise KeyError(uri)
+			path.append(node)
+		node = path[-1]
+		entries = node.entries
+		if entries is None:
+			raise KeyError(uri)
+		if entries.__class__ is tuple:
+			if entries[0] != uri:
+				raise KeyError(uri)
+			node.entries = None
+		else:
+			del entries[uri]
+			if len(entries) == 1:
+				node.entries = next(iter(entries.items()))
+		for node in path:
+			node.count -= 1
+		for i in range(len(key), 0, -1):
+			if path[i].count:
+				break
+			path[i-1].discard(key[i-1])
+
+	def __contains__(self, uri):
+		try:
+			node = self._find(self.key(uri))
+		except uriref.MalformedURLExpection:
+			return False
+		if node is None or node.entries is None:
+			return False
+		if node.entries.__class__ is tuple:
+			return node.entries[0] == uri
+		return uri in node.entries
+
+	def __len__(self):
+		return self.root.count
+
+	def __iter__(self):
+		for uri, value in self._walk(self.root):
+			yield uri
+
+	def count(self, prefix, subdomains=False):
+		"Return the number of URIs under `prefix`, see `iter_prefix`. "
+		node = self._find(self._prefix_key(prefix, subdomains))
+		return node.count if node is not None else 0
+
+	def iter_prefix(self, prefix, subdomains=False):
+		"""
+		Yield (uri, value) for the URIs under the node of URI `prefix`. A
+		trailing '/' of the prefix is ignored, 'https://example.org/docs/'
+		gives the URIs with a path that starts with the segment 'docs'
+		(including '/docs' itself).
+
+		With `subdomains` only the scheme and host of the prefix are used, and
+		the URIs of subdomains and any port are included.
+		"""
+
+		node = self._find(self._prefix_key(prefix, subdomains))
+		if node is not None:
+			for item in self._walk(node):
+				yield item
+
+	def iter_children(self, prefix, subdomains=False):
+		"""
+		Yield (key, count) for the children of the node of `prefix` (see
+		`iter_prefix`), ie. the next path segments and their number of URIs.
+		"""
+
+		node = self._find(self._prefix_key(prefix, subdomains))
+		if node is not None:
+			for k, child in node.items():
+				yield k, child.count
+
+	def _prefix_key(self, prefix, subdomains):
+		key = self.key(prefix, subdomains)
+		if not subdomains and key[-1] == '':
+			key.pop()
+		return key
+
+	def _find(self, key):
+		node = self.root
+		for k in key:
+			node = node.child(k)
+			if node is None:
+				return None
+		return node
+
+	def _walk(self, node):
+		"Yield (uri, value) for each URI in the subtree of `node`, depth first. "
+		stack = [ node ]
+		while stack:
+			node = stack.pop()
+			entries = node.entries
+			if entries.__class__ is tuple:
+				yield entries
+			elif entries is not None:
+				for item in entries.items():
+					yield item
+			if node.children is not None:
+				stack.extend([ child for k, child in reversed(node.items()) ])
+
+
+_end = None
+"Key in a `HostSuffixSet` trie node if a rule ends there. Labels never equal it. "
+
+_host_port = re.compile(r"([^:/?#@\[\]]*|\[[^/?#@\]]*\])(?::[0-9]*)?\Z")
+"A host with an optional port, not a URI. "
+
+_leaf = { _end: True }
+"""
+The node of every rule without longer rules below it, shared to save memory.
+It is replaced by a new node when a longer rule is added.
+"""
+
+
+class HostSuffixSet(object):
+
+	"""
+	A set of host suffix rules, such as 'example.org' for 'example.org' and
+	all its subdomains (but not 'badexample.org'), compiled into a trie of
+	dictionaries keyed by the labels from right to left. A lookup takes one
+	dictionary lookup per host label, however many rules there are.
+
+	Rules may also be given as '.example.org' or '*.example.org'. Hosts are
+	compared in lower case.
+	"""
+
+	def __init__(self, rules=(), grammar='rfc3986'):
+		self.grammar = grammar
+		self.host_match = uriref.compile_for('host', grammar=grammar).match
+		self.root = {}
+		self.rules = 0
+		self.update(rules)
+
+	def add(self, rule):
+		"Add suffix `rule`. "
+		rule = rule.lower().strip('.')
+		if rule.startswith('*.'):
+			rule = rule[2:]
+		if not rule:
+			raise ValueError("Empty host suffix rule")
+		labels = rule.split('.')
+		node = self.root
+		for i in range(len(labels) - 1, 0, -1):
+			child = node.get(labels[i])
+			if child is None or child is _leaf:
+				child = node[sys.intern(labels[i])] = { _end: True } if child else {}
+			node = child
+		label = sys.intern(labels[0])
+		child = node.get(label)
+		if child is None:
+			node[label] = _leaf
+		elif _end not in child:
+			child[_end] = True
+		else:
+			return
+		self.rules += 1
+
+	def update(self, rules):
+		"Add every rule from iterable `rules`. "
+		for rule in rules:
+			self.add(rule)
+
+	def __len__(self):
+		return self.rules
+
+	def host(self, uri_or_host):
+		"""
+		Return the host of `uri_or_host`: the host part of a `uriref.URIRef`,
+		the host of a string that is a host with an optional numeric port (ie.
+		'example.org:8080', not a scheme and path), or else the host of the
+		string as a URI (matched with the host regex of the grammar). Returns
+		None for references without host.
+		"""
+
+		if isinstance(uri_or_host, uriref.URIRef):
+			return uri_or_host.part('host')
+		m = _host_port.match(uri_or_host)
+		if m:
+			return m.group(1)
+		m = self.host_match(uri_or_host)
+		return m and m.group('host')
+
+	def contains(self, uri_or_host):
+		"Return True if the host of `uri_or_host` (see `host`) matches a rule. "
+		host = self.host(uri_or_host)
+		if not host:
+			return False
+		node = self.root
+		for label in reversed(host.lower().rstrip('.').split('.')):
+			node = node.get(label)
+			if node is None:
+				return False
+			if _end in node:
+				return True
+		return False
+
+	__contains__ = contains
+
+	def find(self, uri_or_host):
+		"Return the shortest rule that matches the host of `uri_or_host`, or None. "
+		host = self.host(uri_or_host)
+		if not host:
+			return None
+		labels = host.lower().rstrip('.').split('.')
+		node = self.root
+		for depth in range(1, len(labels) + 1):
+			node = node.get(labels[-depth])
+			if node is None:
+				return None
+			if _end in node:
+				return '.'.join(labels[-depth:])
+		return None
+
+	def filter(self, items, exclude=False):
+		"""
+		Yield the URIs or hosts from iterable `items` that match a rule, or
+		with `exclude` those that do not (ie. for a blocklist).
+		"""
+
+		contains = self.contains
+		for item in items:
+			if contains(item) != exclude:
+				yield item
@@ -0,0 +1,339 @@
+"""
+Parse large files of references, one per line, in a pool of processes.
+
+The file is split into chunks of about `chunk_bytes` that end on a line
+boundary. Each worker process reads and parses its own chunks, so only the
+results are sent back. Lines are decoded as Latin-1, valid references are
+ASCII so their parts are unaffected and character offsets are byte offsets.
+
+`parse_file` returns the parts like `uriref.parse_many`, which are pickled
+from the workers to the parent. `parse_file_offsets` only returns offsets
+per part, which workers write to shared memory, and slices the parts from a
+memory map of the file on access.
+"""
+import array
+import concurrent.futures
+import mmap
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import uriref
+
+
+def chunk_offsets(path, chunk_bytes=1<<22):
+	"""
+	Yield (start, end) byte offsets of consecutive chunks of file `path`. Each
+	chunk is at least `chunk_bytes` long, and ends after a newline or at the
+	end of the file.
+	"""
+
+	size = os.path.getsize(path)
+	with open(path, 'rb') as f:
+		start = 0
+		while start < size:
+			end = start + chunk_bytes
+			if end < size:
+				f.seek(end - 1)
+				end += len(f.readline()) - 1
+			else:
+				end = size
+			yield start, end
+			start = end
+
+
+def read_chunk(path, start, end):
+	"""
+	Return the lines in byte range `start`, `end` of `path` with their line
+	ends. Lines end with LF, not on other Unicode line boundaries.
+	"""
+
+	with open(path, 'rb') as f:
+		f.seek(start)
+		data = f.read(end - start)
+	lines = data.decode('latin-1').split('\n')
+	if not lines[-1]:
+		lines.pop()
+	return lines
+
+def read_lines(path, start, end):
+	"Return the lines in byte range `start`, `end` of `path`, without LF or CR-LF. "
+	return [ line[:-1] if line[-1:] == '\r' else line
+			for line in read_chunk(path, start, end) ]
+
+
+def parse_chunk(path, start, end, fields=None, **kwds):
+	"""
+	Parse the lines of one chunk with `uriref.parse_many`, returns the list of
+	results and a dictionary with statistics for the chunk.
+	"""
+
+	started = time.perf_counter()
+	lines = read_lines(path, start, end)
+	kwds.setdefault('errors', 'ignore')
+	results = list(uriref.parse_many(lines, fields=fields, **kwds))
+	return results, _chunk_stats(started, len(lines), start, end)
+
+
+def offset_chunk(path, start, end, fields=uriref.parts, grammar=None):
+	"""
+	Match the lines of one chunk, and write an offset record for each line to
+	a new shared memory block. Returns the name of the block, the number of
+	lines and a dictionary with statistics for the chunk.
+
+	Records are int32 values: the start and end of the line relative to the
+	chunk, 1 if the line is a valid reference or else 0, and the start and end
+	of each of the `fields` relative to the line (-1 if not matched).
+
+	The block is owned by the parent, which unlinks it: it is unregistered
+	from the resource tracker of the worker, which would otherwise unlink it
+	again (and warn about a leak) when the worker exits.
+	"""
+
+	started = time.perf_counter()
+	lines = read_chunk(path, start, end)
+	regex = uriref.compile_for(fields, validate=True, grammar=grammar)
+	indices = [ regex.groupindex[name] for name in fields ]
+	unmatched = (-1,) * (len(fields) * 2)
+	records = array.array('i')
+	offset = 0
+	for line in lines:
+		length = len(line) + 1
+		if line[-1:] == '\r':
+			line = line[:-1]
+		m = regex.match(line)
+		if m:
+			records.extend((offset, offset + len(line), 1))
+			records.extend(sum(map(m.span, indices), ()))
+		else:
+			records.extend((offset, offset + len(line), 0))
+			records.extend(unmatched)
+		offset += length
+
+	size = records.itemsize * len(records)
+	block = shared_memory.SharedMemory(create=True, size=max(1, size))
+	if os.name == 'posix':
+		resource_tracker.unregister(block._name, 'shared_memory')
+	block.buf[:size] = records.tobytes()
+	block.close()
+	return block.name, len(lines), _chunk_stats(started, len(lines), start, end)
+
+
+class OffsetChunk:
+
+	"""
+	The offset records for the lines of one chunk (see `offset_chunk`), with
+	the chunk `data` as a view on the memory mapped file. Parts are sliced from
+	data without copying.
+
+	Views are valid until `release`, which `parse_file_offsets` calls before it
+	gets the next chunk. Any memoryview from `line` or `view` must be released
+	before that, copy them with `bytes` to keep them.
+	"""
+
+	__slots__ = ('start', 'data', 'fields', 'records', '_width', '_offsets',
+			'_block', '_length')
+
+	def __init__(self, start, data, fields, block, length):
+		self.start = start
+		"Byte offset of the chunk in the file. "
+		self.data = data
+		self.fields = fields
+		self._width = len(fields) * 2 + 3
+		self._offsets = dict([ (name, i * 2 + 3) for i, name in enumerate(fields) ])
+		self._block = block
+		self._length = length
+		self.records = block.buf[:length * self._width * 4].cast('i')
+		"The offset records, a flat memoryview of int32 values. "
+
+	def __len__(self):
+		return self._length
+
+	def valid(self, index):
+		"Return True if line `index` is a valid reference. "
+		return self.records[index * self._width + 2] == 1
+
+	def line(self, index):
+		"Return a memoryview of line `index`. "
+		i = index * self._width
+		return self.data[self.records[i]:self.records[i+1]]
+
+	def span(self, index, name):
+		"Return the (start, end) offset of part `name` in line `index`, or None. "
+		i = index * self._width + self._offsets[name]
+		start = self.records[i]
+		if start < 0:
+			return None
+		return start, self.records[i+1]
+
+	def view(self, index, name):
+		"Return a memoryview of part `name` of line `index`, or None. "
+		i = index * self._width
+		line = self.records[i]
+		i += self._offsets[name]
+		start = self.records[i]
+		if start < 0:
+			return None
+		return self.data[line+start:line+self.records[i+1]]
+
+	def group(self, index, name):
+		"Return part `name` of line `index` as string, or None. "
+		view = self.view(index, name)
+		if view is not None:
+			return str(view, 'latin-1')
+
+	def release(self):
+		"Release the views and free the shared memory block. "
+		if self._block is None:
+			return
+		self.records.release()
+		self.data.release()
+		self._block.close()
+		self._block.unlink()
+		self._block = None
+
+
+def _chunk_stats(started, lines, start, end):
+	return dict(pid=os.getpid(), chunks=1, lines=lines, bytes=end - start,
+			seconds=time.perf_counter() - started)
+
+def _init_worker(fields, kwds):
+	"Compile the regexes for `fields` once, when the worker process starts. "
+	kwds = dict(kwds, errors='ignore')
+	list(uriref.parse_many([''], fields=fields, **kwds))
+
+
+def _update_stats(stats, chunk):
+	"Add chunk statistics to the totals for its worker process in `stats`. "
+	worker = stats.setdefault(chunk['pid'], dict(chunks=0, lines=0, bytes=0,
+			seconds=0.0))
+	for key in ('chunks', 'lines', 'bytes', 'seconds'):
+		worker[key] += chunk[key]
+	if worker['seconds']:
+		worker['lines_per_second'] = worker['lines'] / worker['seconds']
+		worker['bytes_per_second'] = worker['bytes'] / worker['seconds']
+
+
+def _map_chunks(func, path, workers, chunk_bytes, ordered, stats, max_pending,
+		initargs, discard, *args):
+	"""
+	Call `func(path, start, end, *args)` for each chunk, yields the chunk
+	offsets and result. See `parse_file` for the other arguments. Results that
+	are not yielded because the consumer stopped early are passed to
+	`discard`, if given.
+	"""
+
+	if stats is None:
+		stats = {}
+	chunks = chunk_offsets(path, chunk_bytes)
+
+	if workers == 0:
+		_init_worker(*initargs)
+		for start, end in chunks:
+			result = func(path, start, end, *args)
+			_update_stats(stats, result[-1])
+			yield start, end, result
+		return
+
+	workers = workers or os.cpu_count() or 1
+	max_pending = max_pending or workers * 2
+	with concurrent.futures.ProcessPoolExecutor(workers,
+			initializer=_init_worker, initargs=initargs) as pool:
+		pending = {}
+		try:
+			for start, end in chunks:
+				pending[pool.submit(func, path, start, end, *args)] = start, end
+				while len(pending) >= max_pending:
+					yield _collect(pending, ordered, stats)
+			while pending:
+				yield _collect(pending, ordered, stats)
+		finally:
+			for future in pending:
+				if not future.cancel() and discard:
+					discard(future.result())
+
+
+def _collect(pending, ordered, stats):
+	"""
+	Wait for the first (or if not `ordered` any) future, return its chunk
+	offsets and result.
+	"""
+
+	if ordered:
+		future = next(iter(pending))
+	else:
+		done, not_done = concurrent.futures.wait(pending,
+				return_when=concurrent.futures.FIRST_COMPLETED)
+		future = done.pop()
+	start, end = pending.pop(future)
+	result = future.result()
+	_update_stats(stats, result[-1])
+	return start, end, result
+
+
+def parse_file(path, workers=None, chunk_bytes=1<<22, ordered=True,
+		fields=None, stats=None, max_pending=None, **kwds):
+	"""
+	Parse every line of file `path`, yields the results of
+	`uriref.parse_many` for each line: a tuple of `fields`, a single value, or
+	a dictionary with `as_dict`. Other keywords are passed to parse_many, by
+	default `errors` is 'ignore' so that None is yielded for malformed lines.
+
+	Chunks are parsed by `workers` processes (default the number of CPUs).
+	With 0 workers the chunks are parsed in this process. Results come in the
+	order of the lines in the file, or unless `ordered` per chunk as soon as
+	it is done. At most `max_pending` chunks (default twice the number of
+	workers) are read or parsed ahead of the consumer of the results.
+
+	If a `stats` dictionary is given, totals for chunks, lines, bytes and
+	seconds are kept per worker process ID, with the lines and bytes per
+	second parse throughput.
+	"""
+
+	for start, end, (results, chunk) in _map_chunks(_parse_chunk, path,
+			workers, chunk_bytes, ordered, stats, max_pending, (fields, kwds),
+			None, dict(kwds, fields=fields)):
+		for result in results:
+			yield result
+
+def _parse_chunk(path, start, end, kwds):
+	return parse_chunk(path, start, end, **kwds)
+
+
+def parse_file_offsets(path, workers=None, chunk_bytes=1<<22, ordered=True,
+		fields=None, stats=None, max_pending=None, grammar=None):
+	"""
+	Match every line of file `path` in worker processes like `parse_file`,
+	yields an `OffsetChunk` per chunk with the offsets of `fields` (default
+	all `uriref.parts`) for each line.
+
+	Parts are not pickled: workers write fixed-width offset records to shared
+	memory, and parts are sliced from a memory map of the file. Each chunk is
+	released when the next one is requested.
+	"""
+
+	fields = tuple(fields or uriref.parts)
+
+	def discard(result):
+		block = shared_memory.SharedMemory(result[0])
+		block.close()
+		block.unlink()
+
+	with open(path, 'rb') as f:
+		if not os.fstat(f.fileno()).st_size:
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			buffer = memoryview(data)
+			chunk = None
+			try:
+				for start, end, (name, length, stat) in _map_chunks(offset_chunk,
+						path, workers, chunk_bytes, ordered, stats, max_pending,
+						(fields, dict(grammar=grammar)), discard, fields, grammar):
+					chunk = OffsetChunk(start, buffer[start:end], fields,
+							shared_memory.SharedMemory(name), length)
+					yield chunk
+					chunk.release()
+			finally:
+				if chunk is not None:
+					chunk.release()
+				buffer.release()
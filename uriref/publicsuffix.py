@@ -0,0 +1,240 @@
+"""
+Registered domains with the Public Suffix List (https://publicsuffix.org/).
+
+The rules are read from a local copy of the list, nothing is downloaded. They
+are compiled once into a trie of host labels from right to left, which is
+walked once per host. The registered domain of a host is its public suffix
+plus one label, ie. 'example.co.uk' for 'www.example.co.uk'.
+
+The list is loaded on first use from the file named by the environment
+variable URIREF_PUBLIC_SUFFIX_LIST, or else from the first of `default_paths`
+that exists (where Debian, Fedora and other distributions install the list).
+Without a list only the default rule '*' applies, and the registered domain
+is the last two labels of the host (the heuristic of `uriref.onsamedomain`
+before this module), which is wrong for suffixes like 'co.uk'.
+"""
+import os
+import re
+import sys
+
+import uriref
+
+
+_end = None
+"""
+Key in a trie node for a rule that ends at that node, the value is 'rule' or
+'exception'. Labels are strings, so they never equal this key.
+"""
+
+_ipv4 = re.compile(r"^[0-9]+(\.[0-9]+){3}$")
+
+
+def read_rules(path, private=True):
+	"""
+	Yield the rules from the Public Suffix List file `path`, in lower case
+	with internationalized labels encoded as IDNA. Unless `private`, the
+	rules in the private domains section are skipped.
+	"""
+
+	with open(path, encoding='utf-8') as f:
+		for line in f:
+			line = line.strip()
+			if line.startswith('//'):
+				if not private and 'BEGIN PRIVATE DOMAINS' in line:
+					return
+				continue
+			if not line:
+				continue
+			rule = line.split()[0].lower()
+			if not rule.isascii():
+				try:
+					rule = '.'.join([ label if label.isascii()
+						else label.encode('idna').decode('ascii')
+						for label in rule.split('.') ])
+				except UnicodeError:
+					continue
+			yield rule
+
+
+class PublicSuffixList(object):
+
+	"""
+	The public suffix `rules` (in the list format, ie. 'co.uk', '*.ck' or
+	'!www.ck') compiled into a trie of nested dictionaries, keyed by labels
+	from right to left.
+	"""
+
+	def __init__(self, rules=()):
+		self.root = {}
+		self.rules = 0
+		for rule in rules:
+			self.add(rule)
+
+	def add(self, rule):
+		"Add one rule. "
+		kind = 'rule'
+		if rule.startswith('!'):
+			kind, rule = 'exception', rule[1:]
+		node = self.root
+		for label in reversed(rule.lower().split('.')):
+			node = node.setdefault(sys.intern(label), {})
+		if _end not in node:
+			self.rules += 1
+		node[_end] = kind
+
+	def _suffix_labels(self, labels):
+		"Return the number of labels of the public suffix, for reversed `labels`. "
+		length = 1
+		nodes = [ self.root ]
+		for depth, label in enumerate(labels, 1):
+			matched = []
+			for node in nodes:
+				for key in (label, '*'):
+					child = node.get(key)
+					if child is not None:
+						matched.append(child)
+			if not matched:
+				break
+			for node in matched:
+				kind = node.get(_end)
+				if kind == 'exception':
+					return depth - 1
+				if kind == 'rule':
+					length = depth
+			nodes = matched
+		return length
+
+	def _labels(self, host):
+		"Return the labels of `host` in lower case, or None for an IP address. "
+		if not host or host[0] == '[':
+			return None
+		host = host.lower()
+		if host[-1] == '.':
+			host = host[:-1]
+		if _ipv4.match(host):
+			return None
+		return host.split('.')
+
+	def public_suffix(self, host):
+		"Return the public suffix of `host`, or None for an IP address. "
+		labels = self._labels(host)
+		if not labels:
+			return None
+		return '.'.join(labels[-self._suffix_labels(reversed(labels)):])
+
+	def registered_domain(self, host):
+		"""
+		Return the public suffix of `host` and the label before it, or None if
+		the host is an IP address or a public suffix itself.
+		"""
+
+		labels = self._labels(host)
+		if not labels:
+			return None
+		length = self._suffix_labels(reversed(labels)) + 1
+		if length > len(labels):
+			return None
+		return '.'.join(labels[-length:])
+
+	def site(self, host):
+		"""
+		Return the registered domain of `host`, or the host in lower case if it
+		has none (an IP address or a public suffix), or None without a host.
+		"""
+
+		if not host:
+			return None
+		return self.registered_domain(host) or host.lower()
+
+
+environ_key = 'URIREF_PUBLIC_SUFFIX_LIST'
+"The environment variable with the path of the list file for `load`. "
+
+default_paths = (
+	'/usr/share/publicsuffix/public_suffix_list.dat',
+	'/usr/local/share/publicsuffix/public_suffix_list.dat',
+)
+"Paths of the list file tried by `load` if the environment variable is not set. "
+
+public_suffixes = None
+"The list used if none is given, set by `load` (on first use if not before). "
+
+def default_path():
+	"""
+	Return the path in the `environ_key` environment variable, or else the
+	first of `default_paths` that exists. Returns None if there is no such
+	file, or if the variable is set but empty.
+	"""
+
+	path = os.environ.get(environ_key)
+	if path is not None:
+		return path or None
+	for path in default_paths:
+		if os.path.isfile(path):
+			return path
+	return None
+
+def load(path=None, private=True):
+	"""
+	Read the Public Suffix List file `path` (see `read_rules`), and set and
+	return it as `public_suffixes`. The default is `default_path()`, without
+	a path the list has only the default rule.
+	"""
+
+	global public_suffixes
+	if path is None:
+		path = default_path()
+	if path is None:
+		public_suffixes = PublicSuffixList()
+	else:
+		public_suffixes = PublicSuffixList(read_rules(path, private))
+	return public_suffixes
+
+def default_list():
+	"Return `public_suffixes`, after a `load` from the default path if it is not set. "
+	if public_suffixes is None:
+		return load()
+	return public_suffixes
+
+
+def _host_match(grammar):
+	return uriref.compile_for('host', grammar=grammar).match
+
+def registered_domain(url, suffixes=None, grammar='rfc3986'):
+	"""
+	Return the registered domain of the host of reference `url`, or None
+	(see `PublicSuffixList.registered_domain`). The host group is matched with
+	`grammar`, by default 'rfc3986' which also matches hosts without a path.
+	"""
+
+	m = _host_match(grammar)(url)
+	host = m and m.group('host')
+	return (suffixes or default_list()).registered_domain(host)
+
+def same_site(pairs, suffixes=None, grammar='rfc3986', memo=65536):
+	"""
+	Yield True for each pair of references from iterable `pairs` that have a
+	host on the same site, ie. the same registered domain, or the same host
+	if that has none (see `PublicSuffixList.site`). References without a host
+	are not on any site.
+
+	The site of each reference is kept in a memo of at most `memo` entries,
+	so references that repeat in the pairs are parsed once.
+	"""
+
+	suffixes = suffixes or default_list()
+	host_match, site = _host_match(grammar), suffixes.site
+	sites = {}
+	def site_of(url):
+		try:
+			return sites[url]
+		except KeyError:
+			pass
+		if len(sites) >= memo:
+			sites.clear()
+		m = host_match(url)
+		sites[url] = result = site(m and m.group('host'))
+		return result
+	for url1, url2 in pairs:
+		site1 = site_of(url1)
+		yield site1 is not None and site1 == site_of(url2)